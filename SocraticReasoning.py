@@ -1,56 +1,72 @@
+import asyncio
 import logging
-import os
 import pathlib
+import time
 import ujson
+from collections import Counter
 from datetime import datetime
-from chatter import GPT4o, GroqModel, OllamaModel
+from chatter import ChatterError, ChatterWrapper, GPT4o, GroqModel, OllamaModel, stream_from
 from logic import LogicTables
+from inference import ForwardChainer
+from equivalence import EquivalenceIndex
+from extraction import ConclusionStream, ExtractedConclusion, conclusion_prompt, extract_conclusion
 from memory.memory import create_memory_folders, store_in_stm, DialogEntry
+from memory.premises import DEFAULT_SESSION, get_premise_journal
+from memory.jsonlog import get_jsonl_log
 from api import APIManager
+from logsink import get_log_sink
+from budget import BudgetExceeded, LIMIT_REASONS, PROVIDER_ERROR, STOP_REASONS, ReasoningBudget, ReasoningResult
 
 class SocraticReasoning:
-    def __init__(self, chatter):
+    def __init__(self, chatter, session=DEFAULT_SESSION):
         """
         Initializes the SocraticReasoning instance with necessary configurations.
         
         Args:
             chatter: An instance of the model used for generating responses.
+            session: The premise journal session of this reasoner; reasoners with different
+                sessions keep separate premises in the shared journal.
         """
         self.premises = []  # List to hold premises
-        self.logger = logging.getLogger('SocraticReasoning')
-        self.logger.setLevel(logging.DEBUG)  # Set to DEBUG to capture all SocraticReasoning logs
-
-        # Ensure the logs directory exists
-        logs_dir = './memory/logs'
-        os.makedirs(logs_dir, exist_ok=True)
-
-        # File handler for saving Socratic Reasoning logs
-        file_handler = logging.FileHandler(os.path.join(logs_dir, 'socraticlogs.txt'))
-        file_handler.setLevel(logging.DEBUG)
-        file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(file_formatter)
+        self.equivalence_index = EquivalenceIndex()  # Canonical form -> equivalent premises
+        # Logs go through the shared queue-backed sink to socraticlogs.txt and errorlogs.txt
+        self.logger = get_log_sink().attach('SocraticReasoning', ['./memory/logs/socraticlogs.txt', './memory/logs/errorlogs.txt'])
 
         # Stream handler to suppress lower-level logs in the terminal
-        stream_handler = logging.StreamHandler()
-        stream_handler.setLevel(logging.CRITICAL)  # Show only critical logs in the terminal
-        stream_formatter = logging.Formatter('%(message)s')
-        stream_handler.setFormatter(stream_formatter)
-
-        # Adding handlers to the logger
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(stream_handler)
+        if not any(getattr(handler, 'socratic_console', False) for handler in self.logger.handlers):
+            stream_handler = logging.StreamHandler()
+            stream_handler.setLevel(logging.CRITICAL)  # Show only critical logs in the terminal
+            stream_handler.setFormatter(logging.Formatter('%(message)s'))
+            stream_handler.socratic_console = True
+            self.logger.addHandler(stream_handler)
 
         # File paths for saving premises, non-premises, conclusions, and truth tables
-        self.premises_file = './memory/logs/premises.json'
-        self.not_premises_file = './memory/logs/notpremise.json'
+        self.premises_file = './memory/logs/premises.jsonl'  # Append-only premise events
+        self.not_premises_file = './memory/logs/notpremise.jsonl'  # Rotating append-only log
         self.conclusions_file = './memory/logs/conclusions.txt'  # Path to save conclusions
         self.truth_tables_file = './memory/logs/truth_tables.json'  # Path to save truth tables
 
         self.max_tokens = 100  # Default max tokens for Socratic premise from add_premise(statement)
+        self.conclusion_max_tokens = 400  # The structured conclusion reply runs to several lines
+        self.budget_limits = {'deadline': None, 'max_llm_calls': None, 'max_tokens': None,
+                              'max_retries': 3}  # Limits for runs started without an explicit ReasoningBudget
         self.chatter = chatter  # Chatter model for generating responses
         self.logic_tables = LogicTables()  # Logic tables for reasoning
+        self.inference = ForwardChainer(self.logic_tables)  # Symbolic forward chaining over facts and rules
         self.dialogue_history = []  # List to hold the history of dialogues
         self.logical_conclusion = ""  # Variable to store the conclusion
+        self.extracted_conclusion = None  # Structured form of the conclusion, see extraction.py
+        self.propositions = {}  # Proposition name -> statement declared by the model this round
+        self.speculation_stats = {'runs': 0, 'wins': 0, 'paid_off': 0, 'timeouts': 0, 'cancelled': 0,
+                                  'branch_wins': Counter(), 'llm_calls': 0}  # Telemetry for draw_conclusion_speculative
+        self.last_speculation = []  # Per-branch telemetry of the most recent speculative run
+        self.last_result = None  # ReasoningResult of the most recent run
+
+        # Rebuild the premises of this session's unfinished round from the shared premise journal
+        self.premise_journal = get_premise_journal(self.premises_file).session(session)
+        for premise in self.premise_journal.premises:
+            if not self.equivalence_index.add(premise):
+                self.premises.append(premise)
 
         create_memory_folders()  # Ensure memory folders are created
 
@@ -66,20 +82,6 @@ class SocraticReasoning:
             self.logger.info(message)
         elif level == 'error':
             self.logger.error(message)
-        self.log_errors(message, level)  # Save Socratic reasoning to ./memory/logs/socraticlogs.txt
-
-    def log_errors(self, message, level):
-        """
-        Stores error logs in ./memory/logs/errorlogs.txt.
-
-        Args:
-            message: The error message to be logged.
-            level: The level of the error.
-        """
-        error_logs_path = './memory/logs/errorlogs.txt'
-        pathlib.Path(error_logs_path).parent.mkdir(parents=True, exist_ok=True)
-        with open(error_logs_path, 'a') as file:
-            file.write(f"{level.upper()}: {message}\n")
 
     def log_not_premise(self, message, level='info'):
         """
@@ -89,37 +91,23 @@ class SocraticReasoning:
             message: The message to be logged.
             level: The level of logging.
         """
-        not_premises_path = self.not_premises_file
-        pathlib.Path(not_premises_path).parent.mkdir(parents=True, exist_ok=True)
-        entry = {"level": level.upper(), "message": message}
-        try:
-            with open(not_premises_path, 'r') as file:
-                logs = ujson.load(file)
-        except (FileNotFoundError, ValueError):
-            logs = []
-
-        logs.append(entry)
-        with open(not_premises_path, 'w') as file:
-            ujson.dump(logs, file, indent=2)
-
-    def save_premises(self):
-        """
-        Saves the current list of premises to a JSON file.
-        """
-        pathlib.Path(self.premises_file).parent.mkdir(parents=True, exist_ok=True)
-        with open(self.premises_file, 'w') as file:
-            ujson.dump(self.premises, file, indent=2)
+        get_jsonl_log(self.not_premises_file).append({"level": level.upper(), "message": message})
 
     def add_premise(self, premise):
         """
-        Adds a premise to the list if valid and saves the premises.
+        Adds a premise to the list if valid and not equivalent to an existing premise,
+        and saves the premises.
 
         Args:
             premise: The premise to be added.
         """
         if self.parse_statement(premise):  # Check if the premise is valid
+            equivalents = self.equivalence_index.add(premise)
+            if equivalents:
+                self.log_not_premise(f'Duplicate premise: {premise} (equivalent to {equivalents[0]})')
+                return
             self.premises.append(premise)  # Add the premise to the list
-            self.save_premises()  # Save the updated list of premises
+            self.premise_journal.add(premise)  # Record the addition
         else:
             self.log_not_premise(f'Invalid premise: {premise}', level='error')  # Log invalid premise
 
@@ -135,18 +123,52 @@ class SocraticReasoning:
         """
         return isinstance(statement, str) and len(statement) > 0  # Check if the statement is a non-empty string
 
-    def generate_new_premise(self, premise):
+    def new_budget(self):
+        """
+        Returns a ReasoningBudget built from budget_limits.
+        """
+        return ReasoningBudget(**self.budget_limits)
+
+    def generate_response(self, knowledge, budget=None, max_tokens=None, **options):
+        """
+        Calls the chatter with the max_tokens limit and the budget of the current run.
+
+        Args:
+            knowledge: The prompt text.
+            budget: The ReasoningBudget charged for the call.
+            max_tokens: The token limit of the call; defaults to max_tokens.
+            **options: Passed to the chatter, e.g. bypass_cache for a wrapped chatter.
+
+        Returns:
+            str: The raw response.
+        """
+        return self.chatter.generate_response(knowledge, max_tokens=max_tokens or self.max_tokens, budget=budget, **options)
+
+    def fresh_options(self, repeat):
+        """
+        Returns the chatter options for a call. A repeated prompt within a run would be answered
+        from a wrapped chatter's cache, or by an identical call in flight, with the answer the
+        run already has, so it asks the wrappers for a new answer instead.
+
+        Args:
+            repeat: Whether the run has already sent this prompt.
+        """
+        return {'bypass_cache': True} if repeat and isinstance(self.chatter, ChatterWrapper) else {}
+
+    def generate_new_premise(self, premise, budget=None, **options):
         """
         Generates a new premise based on the current premise.
 
         Args:
             premise: The current premise.
+            budget: The ReasoningBudget charged for the call.
+            **options: Passed to the chatter, e.g. from fresh_options.
 
         Returns:
             str: A new premise generated from the current premise.
         """
         premise_text = f"- {premise}"
-        new_premise = self.chatter.generate_response(premise_text)
+        new_premise = self.generate_response(premise_text, budget, **options)
         return new_premise.strip()
 
     def challenge_premise(self, premise):
@@ -158,92 +180,546 @@ class SocraticReasoning:
         """
         if premise in self.premises:  # Check if the premise exists in the list
             self.premises.remove(premise)  # Remove the premise from the list
+            self.premise_journal.remove(premise)  # Record the removal
             self.log(f'Challenged and removed premise: {premise}')  # Log the removal
             self.remove_equivalent_premises(premise)  # Remove equivalent premises
-            self.save_premises()  # Save the updated list of premises
         else:
             self.log_not_premise(f'Premise not found: {premise}', level='error')  # Log if premise not found
 
     def remove_equivalent_premises(self, premise):
         """
         Removes premises that are logically equivalent to the challenged premise.
+        Equivalent premises are found with one lookup in the equivalence index.
 
         Args:
             premise: The premise to be checked for equivalence.
         """
-        equivalent_premises = [p for p in self.premises if self.logic_tables.unify_variables(premise, p)]
+        equivalent_premises = [p for p in self.equivalence_index.remove_class(premise) if p != premise and p in self.premises]
         for p in equivalent_premises:
             self.premises.remove(p)  # Remove equivalent premise
+            self.premise_journal.remove(p)  # Record the removal
             self.log_not_premise(f'Removed equivalent premise: {p}')  # Log removal of equivalent premise
-        self.save_premises()  # Save the updated list of premises
 
-    def draw_conclusion(self):
+    def add_fact(self, fact):
+        """
+        Adds a symbolic fact for forward chaining.
+
+        Args:
+            fact: A tuple (relation, *arguments) or a LogicTables fact dict.
+        """
+        self.inference.add_fact(fact)
+
+    def add_rule(self, rule):
+        """
+        Adds a rule for forward chaining.
+
+        Args:
+            rule: An inference.Rule or a LogicTables rule dict handled by modus_ponens.
+        """
+        self.inference.add_rule(rule)
+
+    def derive_conclusions(self):
+        """
+        Runs forward chaining to a fixpoint without any LLM calls.
+
+        Returns:
+            list: The facts derived since the last call.
+        """
+        derived = self.inference.run()
+        stats = self.inference.stats
+        self.log(f"Forward chaining derived {len(derived)} facts "
+                 f"({stats['derived']} total, {stats['activations']} activations, {stats['elapsed']:.4f}s total)")
+        return derived
+
+    def draw_conclusion(self, budget=None):
         """
         Draws a conclusion based on the current list of premises.
 
+        Args:
+            budget: A ReasoningBudget for the run; defaults to one built from budget_limits.
+
         Returns:
-            str: The conclusion derived from the premises.
+            str: The conclusion derived from the premises. The full outcome, including why the
+            run stopped, is kept in last_result.
         """
         if not self.premises:  # Check if there are no premises
             #self.log('No premises available for logic as conclusion.', level='error')  # Log the absence of premises
             return "No premises available for logic as conclusion."
 
+        budget = (budget or self.new_budget()).start()
         current_premise = self.premises[0]  # Start with the first premise
         additional_premises_count = 0  # Counter for additional premises
+        self.logical_conclusion = ""
+        self.extracted_conclusion = None
+        reason = 'max_premises'
+        premise_calls = 0
+        conclusion_prompts = set()  # Prompts sent this run; a repeat must not be a cache replay
+
+        # Generate new premises until a valid conclusion is drawn, the maximum limit is reached
+        # or the budget runs out
+        try:
+            while additional_premises_count < 5:
+                # Every premise request repeats the same prompt, so only the first may be cached
+                new_premise = self.generate_new_premise(current_premise, budget, **self.fresh_options(premise_calls > 0))
+                premise_calls += 1
+                if not self.parse_statement(new_premise):
+                    #self.log_not_premise(f'Invalid generated premise: {new_premise}', level='error')
+                    budget.charge_retry()  # Rejected output counts against max_retries
+                    continue
+                if not self.equivalence_index.add(new_premise):  # Skip reworded duplicates
+                    self.premises.append(new_premise)
+                    self.premise_journal.add(new_premise)
+                additional_premises_count += 1
+
+                # Ask for the conclusion in the structured format over the current premises
+                prompt = self.conclusion_prompt()
+                raw_response = self.generate_response(prompt, budget, self.conclusion_max_tokens,
+                                                      **self.fresh_options(prompt in conclusion_prompts))
+                conclusion_prompts.add(prompt)
+
+                # Process the response to get the conclusion
+                self.store_conclusion(raw_response)
+
+                if self.validate_conclusion():  # Validate the conclusion
+                    reason = 'validated'
+                    break
+                else:
+                    self.log_not_premise('Invalid conclusion. Generating more premises.', level='error')
+        except BudgetExceeded as e:
+            reason = e.reason
+            self.log(f'Reasoning stopped early ({e.reason}): {e}', level='error')
+        except ChatterError as e:
+            reason = PROVIDER_ERROR
+            self.log(f'Reasoning stopped by a provider error: {e}', level='error')
 
-        # Generate new premises until a valid conclusion is drawn or the maximum limit is reached
-        while additional_premises_count < 5:
-            new_premise = self.generate_new_premise(current_premise)
-            if not self.parse_statement(new_premise):
-                #self.log_not_premise(f'Invalid generated premise: {new_premise}', level='error')
-                continue
-            self.premises.append(new_premise)
-            self.save_premises()
-            additional_premises_count += 1
-
-            # Use the current premise as the input (knowledge) for generating a response
-            raw_response = self.chatter.generate_response(current_premise)
+        return self.finish_conclusion(reason, budget)
 
-            # Process the response to get the conclusion
-            conclusion = raw_response.strip()
+    def finish_conclusion(self, reason='max_premises', budget=None):
+        """
+        Records the final premises and conclusion of a run, stores its ReasoningResult in
+        last_result and resets the premises.
 
-            self.logical_conclusion = conclusion  # Store the conclusion
+        Args:
+            reason: Why the run stopped: 'validated', 'max_premises' or one of STOP_REASONS.
+            budget: The ReasoningBudget of the run, used for the usage figures.
 
-            if self.validate_conclusion():  # Validate the conclusion
-                break
-            else:
-                self.log_not_premise('Invalid conclusion. Generating more premises.', level='error')
+        Returns:
+            str: The conclusion.
+        """
+        if not self.logical_conclusion and reason in LIMIT_REASONS:
+            self.logical_conclusion = f"No conclusion reached before the {reason} limit."
+        elif not self.logical_conclusion and reason == PROVIDER_ERROR:
+            self.logical_conclusion = "No conclusion reached: the language model provider failed."
+        self.last_result = ReasoningResult(self.logical_conclusion, self.premises, reason,
+                                           budget.usage() if budget is not None else {})
 
-        # Save the conclusion along with premises
-        conclusion_entry = {"premises": self.premises, "conclusion": self.logical_conclusion}
-        pathlib.Path(self.premises_file).parent.mkdir(parents=True, exist_ok=True)
-        with open(self.premises_file, 'w') as file:
-            ujson.dump(conclusion_entry, file, indent=2)
+        # Record the conclusion along with premises; this also clears the journaled premises
+        self.premise_journal.conclude(self.premises, self.logical_conclusion, reason)
 
         # Log the conclusion to conclusions.txt
         pathlib.Path(self.conclusions_file).parent.mkdir(parents=True, exist_ok=True)
         with open(self.conclusions_file, 'a') as file:
             file.write(f"Premises: {self.premises}\nConclusion: {self.logical_conclusion}\n")
 
-        # Log the final premises to conclusion
-        #self.log(f"Final Premises to Conclusion:\nPremises: {self.premises}\nConclusion: {self.logical_conclusion}")
-
         # Save the valid conclusion as a truth
         self.save_truth(self.logical_conclusion)
 
         # Clear the premises list for the next round
         self.premises = []
+        self.equivalence_index.clear()
+        self.propositions = {}
 
         return self.logical_conclusion  # Return the conclusion
 
-    def validate_conclusion(self):
+    async def generate_response_async(self, knowledge, budget=None, max_tokens=None, **options):
+        """
+        Calls the chatter without blocking the event loop: natively through its
+        generate_response_async, or in a worker thread for a chatter that has none.
+
+        Args:
+            knowledge: The prompt text.
+            budget: The ReasoningBudget charged for the call.
+            max_tokens: The token limit of the call; defaults to max_tokens.
+            **options: Passed to the chatter, e.g. bypass_cache for a wrapped chatter.
+
+        Returns:
+            str: The raw response.
+        """
+        generate = getattr(self.chatter, 'generate_response_async', None)
+        if generate is None:
+            return await asyncio.to_thread(self.generate_response, knowledge, budget, max_tokens, **options)
+        return await generate(knowledge, max_tokens=max_tokens or self.max_tokens, budget=budget, **options)
+
+    async def stream_response_async(self, knowledge, budget=None, on_partial=None, max_tokens=None, **options):
+        """
+        Streams the chatter's response, reporting the conclusion line of the structured reply
+        as it arrives. A chatter that cannot stream reports it once, with its whole response.
+
+        Args:
+            knowledge: The prompt text.
+            budget: The ReasoningBudget charged for the call.
+            on_partial: Called, or awaited if it is a coroutine function, with the conclusion
+                text received so far each time it grows.
+            max_tokens: The token limit of the call; defaults to max_tokens.
+            **options: Passed to the chatter, e.g. bypass_cache for a wrapped chatter.
+
+        Returns:
+            str: The raw response.
+        """
+        stream = ConclusionStream()
+        async for chunk in stream_from(self.chatter, knowledge, max_tokens=max_tokens or self.max_tokens, budget=budget,
+                                       **options):
+            text = stream.feed(chunk)
+            if text is not None and on_partial is not None:
+                result = on_partial(text)
+                if asyncio.iscoroutine(result):
+                    await result
+        return stream.response
+
+    async def generate_new_premise_async(self, premise, budget=None, **options):
+        """
+        Async counterpart of generate_new_premise.
+        """
+        new_premise = await self.generate_response_async(f"- {premise}", budget, **options)
+        return new_premise.strip()
+
+    async def draw_conclusion_async(self, sequential=False, budget=None, on_partial=None):
         """
-        Validates the logical conclusion.
+        Draws a conclusion like draw_conclusion, running independent LLM calls concurrently.
+
+        The conclusion of an iteration is requested over the premises including that
+        iteration's new premise, as in draw_conclusion. New premises are generated from the
+        first premise only, so the premise for the next iteration is requested while the
+        current conclusion is being generated and validated. A premise generated for an
+        iteration that is never reached is cancelled.
+
+        Args:
+            sequential: Run the original sequential draw_conclusion in a worker thread instead.
+            budget: A ReasoningBudget for the run; defaults to one built from budget_limits.
+            on_partial: If given, each conclusion is streamed and on_partial is called with its
+                text so far as tokens arrive, e.g. to show it in a chat window. Every iteration
+                starts a new conclusion; the returned conclusion is the final word.
+
+        Returns:
+            str: The conclusion derived from the premises.
+        """
+        if sequential:
+            return await asyncio.to_thread(self.draw_conclusion, budget)
+
+        if not self.premises:  # Check if there are no premises
+            return "No premises available for logic as conclusion."
+
+        budget = (budget or self.new_budget()).start()
+        current_premise = self.premises[0]  # Start with the first premise
+        additional_premises_count = 0  # Counter for additional premises
+        self.logical_conclusion = ""
+        self.extracted_conclusion = None
+        reason = 'max_premises'
+        # Every premise request repeats the same prompt, so only the first may be cached
+        fresh = self.fresh_options(True)
+        premise_task = asyncio.create_task(self.generate_new_premise_async(current_premise, budget))
+        conclusion_task = None
+        conclusion_prompts = set()  # Prompts sent this run; a repeat must not be a cache replay
+
+        try:
+            while additional_premises_count < 5:
+                new_premise = await premise_task
+                premise_task = None
+                if not self.parse_statement(new_premise):
+                    budget.charge_retry()  # Rejected output counts against max_retries
+                    premise_task = asyncio.create_task(self.generate_new_premise_async(current_premise, budget, **fresh))
+                    continue
+                if not self.equivalence_index.add(new_premise):  # Skip reworded duplicates
+                    self.premises.append(new_premise)
+                    self.premise_journal.add(new_premise)
+                additional_premises_count += 1
+
+                # Ask for the conclusion in the structured format over the premises including the new one
+                prompt = self.conclusion_prompt()
+                options = self.fresh_options(prompt in conclusion_prompts)
+                conclusion_prompts.add(prompt)
+                if on_partial is None:
+                    conclusion_call = self.generate_response_async(prompt, budget, self.conclusion_max_tokens, **options)
+                else:
+                    conclusion_call = self.stream_response_async(prompt, budget, on_partial,
+                                                                 self.conclusion_max_tokens, **options)
+                conclusion_task = asyncio.create_task(conclusion_call)
+                if additional_premises_count < 5:
+                    # The next premise depends only on the first one, so overlap it with this conclusion
+                    premise_task = asyncio.create_task(self.generate_new_premise_async(current_premise, budget, **fresh))
+
+                raw_response = await conclusion_task
+                conclusion_task = None
+                self.store_conclusion(raw_response)
+
+                if self.validate_conclusion():  # Validate the conclusion
+                    reason = 'validated'
+                    break
+                else:
+                    self.log_not_premise('Invalid conclusion. Generating more premises.', level='error')
+        except BudgetExceeded as e:
+            reason = e.reason
+            self.log(f'Reasoning stopped early ({e.reason}): {e}', level='error')
+        except ChatterError as e:
+            reason = PROVIDER_ERROR
+            self.log(f'Reasoning stopped by a provider error: {e}', level='error')
+        finally:
+            for task in (premise_task, conclusion_task):
+                if task is None:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # Retrieve a budget stop raised by a prefetched call
+
+        return self.finish_conclusion(reason, budget)
+
+    async def run_branch(self, telemetry, current_premise, iterations, budget=None):
+        """
+        Runs one speculative premise/conclusion chain on private state. Each conclusion is
+        requested over the shared premises plus the branch's own; propositions and logic table
+        variables the branch picks up are staged and merged by draw_conclusion_speculative
+        only if the branch wins.
+
+        Args:
+            telemetry: The dict this branch reports into; kept current so cancelled branches still report.
+            current_premise: The premise every iteration reasons from.
+            iterations: The maximum number of iterations.
+            budget: The ReasoningBudget shared by all branches of the run.
+
+        Returns:
+            tuple: (premises generated, last conclusion, whether it validated,
+            staged propositions)
+        """
+        premises = []
+        conclusion = ""
+        propositions = dict(self.propositions)
+        logic_tables = self.logic_tables.fork()
+        # Branch 0 starts like the sequential chain; the others need their own samples, not a
+        # shared or cached one, and every later premise request repeats the first one
+        options = self.fresh_options(telemetry['branch'] > 0)
+        fresh = self.fresh_options(True)
+        premise_task = asyncio.create_task(self.generate_new_premise_async(current_premise, budget, **options))
+        conclusion_task = None
+        conclusion_prompts = set()
+        try:
+            for iteration in range(iterations):
+                new_premise = await premise_task
+                premise_task = None
+                telemetry['llm_calls'] += 1
+                if self.parse_statement(new_premise):
+                    premises.append(new_premise)
+                prompt = self.conclusion_prompt(self.premises + premises, propositions)
+                conclusion_task = asyncio.create_task(self.generate_response_async(
+                    prompt, budget, self.conclusion_max_tokens, **(fresh if prompt in conclusion_prompts else options)))
+                conclusion_prompts.add(prompt)
+                if iteration + 1 < iterations:
+                    # The next premise depends only on current_premise, so overlap it with this conclusion
+                    premise_task = asyncio.create_task(self.generate_new_premise_async(current_premise, budget, **fresh))
+                raw_response = await conclusion_task
+                conclusion_task = None
+                telemetry['iterations'] += 1
+                telemetry['llm_calls'] += 1
+                extracted = self.extract_conclusion(raw_response, propositions, logic_tables)
+                conclusion = extracted.text if extracted is not None else raw_response.strip()
+                if self.validate_conclusion(extracted, logic_tables, self.premises + premises):
+                    return premises, conclusion, True, propositions
+        except BudgetExceeded as e:
+            telemetry['outcome'] = e.reason
+        except ChatterError:
+            telemetry['outcome'] = PROVIDER_ERROR
+        finally:
+            for task in (premise_task, conclusion_task):
+                if task is None:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # Retrieve a budget stop raised by a prefetched call
+        return premises, conclusion, False, propositions
+
+    async def draw_conclusion_speculative(self, branches=3, deadline=60.0, branch_budget=5, budget=None):
+        """
+        Draws a conclusion by racing several independent premise/conclusion chains.
+
+        The first branch whose conclusion validates is accepted and the others are cancelled.
+        If none validates before the deadline or within its budget, the conclusion of the first
+        branch to finish is used. Per-branch telemetry is kept in last_speculation and
+        aggregated in speculation_stats, where paid_off counts runs won by a branch other
+        than branch 0, which is the one a sequential run would have taken.
+
+        Args:
+            branches: The number of branches (K) launched in parallel.
+            deadline: Seconds to wait for a valid conclusion before giving up.
+            branch_budget: The maximum number of iterations per branch.
+            budget: A ReasoningBudget shared by all branches; defaults to one built from budget_limits.
+
+        Returns:
+            str: The conclusion derived from the premises.
+        """
+        if not self.premises:  # Check if there are no premises
+            return "No premises available for logic as conclusion."
+
+        budget = (budget or self.new_budget()).start()
+        if budget.remaining_time() is not None:
+            deadline = min(deadline, budget.remaining_time())
+        current_premise = self.premises[0]
+        start = time.perf_counter()
+        telemetry = [{'branch': i, 'iterations': 0, 'llm_calls': 0, 'outcome': 'cancelled', 'elapsed': None}
+                     for i in range(branches)]
+
+        async def branch(index):
+            try:
+                return index, await self.run_branch(telemetry[index], current_premise, branch_budget, budget)
+            finally:
+                telemetry[index]['elapsed'] = time.perf_counter() - start
+
+        tasks = [asyncio.create_task(branch(i)) for i in range(branches)]
+        winner = None
+        fallback = None
+        timed_out = False
+        try:
+            for next_done in asyncio.as_completed(tasks, timeout=deadline):
+                index, (premises, conclusion, valid, staged) = await next_done
+                if valid:
+                    telemetry[index]['outcome'] = 'won'
+                elif telemetry[index]['outcome'] == 'cancelled':
+                    telemetry[index]['outcome'] = 'exhausted'
+                if fallback is None:
+                    fallback = (index, premises, conclusion)
+                if valid:
+                    winner = (index, premises, conclusion)
+                    self.merge_branch(staged)
+                    break
+        except asyncio.TimeoutError:
+            timed_out = True
+            self.speculation_stats['timeouts'] += 1
+            self.log(f'Speculative reasoning hit its {deadline}s deadline', level='error')
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        stats = self.speculation_stats
+        stats['runs'] += 1
+        stats['cancelled'] += sum(1 for t in telemetry if t['outcome'] == 'cancelled')
+        stats['llm_calls'] += sum(t['llm_calls'] for t in telemetry)
+        if winner is not None:
+            stats['wins'] += 1
+            stats['branch_wins'][winner[0]] += 1
+            if winner[0] != 0:
+                stats['paid_off'] += 1
+        self.last_speculation = telemetry
+        self.log(f"Speculative reasoning: winner={winner[0] if winner else None} branches={telemetry}")
+
+        chosen = winner or fallback
+        if winner is not None:
+            reason = 'validated'
+        elif timed_out or fallback is None:
+            reason = 'deadline'
+        else:
+            outcome = telemetry[fallback[0]]['outcome']
+            reason = outcome if outcome in STOP_REASONS else 'max_premises'
+        if chosen is None:
+            self.logical_conclusion = "No conclusion reached before the deadline."
+        else:
+            _, premises, self.logical_conclusion = chosen
+            for premise in premises:
+                if not self.equivalence_index.add(premise):
+                    self.premises.append(premise)
+                    self.premise_journal.add(premise)
+        return self.finish_conclusion(reason, budget)
+
+    def conclusion_prompt(self, premises=None, propositions=None):
+        """
+        Returns the prompt asking for a conclusion in the structured format parsed by
+        extract_conclusion, over the current premises and propositions unless others are given.
+        """
+        return conclusion_prompt(self.premises if premises is None else premises,
+                                 self.propositions if propositions is None else propositions)
+
+    def extract_conclusion(self, response, propositions=None, logic_tables=None):
+        """
+        Parses a model reply into an ExtractedConclusion over the session's variables, which are
+        the logic table variables and the propositions declared so far this round.
+
+        Args:
+            response: The raw model reply.
+            propositions: The propositions to read and extend instead of self.propositions,
+                e.g. a speculative branch's staged copy.
+            logic_tables: The LogicTables to read variables from instead of self.logic_tables.
+
+        Returns:
+            ExtractedConclusion: The parsed conclusion, or None if the reply has no usable formula.
+        """
+        propositions = self.propositions if propositions is None else propositions
+        logic_tables = logic_tables or self.logic_tables
+        extracted = extract_conclusion(response, list(logic_tables.variables) + list(propositions))
+        if extracted is not None:
+            propositions.update(extracted.propositions)
+        return extracted
+
+    def merge_branch(self, propositions):
+        """
+        Adopts the propositions staged by a winning speculative branch.
+        """
+        self.propositions.update(propositions)
+
+    def store_conclusion(self, response):
+        """
+        Stores a model reply as the current conclusion, keeping its structured form.
+        """
+        self.extracted_conclusion = self.extract_conclusion(response)
+        if self.extracted_conclusion is not None:
+            self.logical_conclusion = self.extracted_conclusion.text
+        else:
+            self.logical_conclusion = response.strip()
+
+    def validate_conclusion(self, conclusion=None, logic_tables=None, premises=None):
+        """
+        Validates the logical conclusion. A conclusion is valid when its reply restates every
+        session premise as a formula, those formulas are consistent and entail its formula, and
+        its formula is not just one of them restated. Without session premises a bare formula
+        must be a tautology.
+
+        Args:
+            conclusion: An ExtractedConclusion or reply text; defaults to the stored conclusion.
+            logic_tables: The LogicTables to check against and extend; defaults to a fork of
+                self.logic_tables, so the reply's variables do not pile up across rounds.
+            premises: The session premises the reply must restate; defaults to self.premises.
 
         Returns:
             bool: True if the conclusion is valid, False otherwise.
         """
-        return self.logic_tables.tautology(self.logical_conclusion)  # Validate using logic tables
+        logic_tables = logic_tables or self.logic_tables.fork()
+        premises = self.premises if premises is None else premises
+        if conclusion is None:
+            conclusion = self.extracted_conclusion or self.logical_conclusion
+        if not isinstance(conclusion, ExtractedConclusion):
+            conclusion = self.extract_conclusion(conclusion, logic_tables=logic_tables)
+        if conclusion is None:
+            return False  # Free text without a formula cannot be checked
+
+        if len(conclusion.premises) < len(premises):
+            # Otherwise 'premises: m / formula: m' would validate whatever the session premises say
+            self.log_not_premise(f'Reply restates {len(conclusion.premises)} of {len(premises)} premises '
+                                 f'as formulas: {conclusion.premises}', level='error')
+            return False
+
+        for var in sorted(conclusion.variables):
+            if var not in logic_tables.variables:
+                logic_tables.add_variable(var)
+        for premise in conclusion.premises:
+            if logic_tables.tautology(f"(({premise}) implication ({conclusion.formula})) and "
+                                      f"(({conclusion.formula}) implication ({premise}))"):
+                self.log_not_premise(f'Conclusion {conclusion.formula} only restates the premise {premise}',
+                                     level='error')
+                return False
+        if conclusion.premises and not logic_tables.check_satisfiability(conclusion.premise_formula())[0]:
+            self.log_not_premise(f'Inconsistent premise formulas: {conclusion.premises}', level='error')
+            return False
+        return logic_tables.tautology(conclusion.entailment())  # Validate using logic tables
 
     def save_truth(self, truth):
         """
@@ -284,19 +760,16 @@ class SocraticReasoning:
         with open(self.truth_tables_file, 'w') as file:
             ujson.dump(truth_tables_entry, file, indent=2)
 
-        # Save a timestamped file in ./memory/truth
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        belief_timestamp_file = f'./memory/truth/belief_{timestamp}.json'
-        pathlib.Path(belief_timestamp_file).parent.mkdir(parents=True, exist_ok=True)
-        with open(belief_timestamp_file, 'w') as file:
-            ujson.dump(truth_tables_entry, file, indent=2)
+        # Record the update in the belief journal in ./memory/truth/journal
+        self.logic_tables.belief_journal.append(truth_tables_entry)
 
         # Add a log entry to confirm the update
         self.logger.info("Updated logic tables: %s", truth_tables_entry)
 
     def set_max_tokens(self, max_tokens):
         """
-        Sets the maximum number of tokens for generating a response.
+        Sets the maximum number of tokens for generating a premise or other free-text response;
+        structured conclusion requests use conclusion_max_tokens.
 
         Args:
             max_tokens: The maximum number of tokens.
@@ -3,7 +3,7 @@ from SocraticReasoning import SocraticReasoning
 from logic import LogicTables
 from memory.memory import store_in_stm, DialogEntry
 from chatter import GPT4o, Groq
-from api import APIManager  # ensure this import statement is added
+from api import get_api_manager  # ensure this import statement is added
 
 class AGI:
     def __init__(self, chatter):
@@ -27,7 +27,7 @@ class AGI:
 class EasyAGI:
     def __init__(self):
         # Initialize EasyAGI with APIManager and AGI instances
-        self.api_manager = APIManager()
+        self.api_manager = get_api_manager()
         self.api_manager.manage_api_keys()  # call the method directly from APIManager
         self.agi = AGI(self.api_manager)
         self.initialize_memory()
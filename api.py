@@ -1,39 +1,109 @@
 # api.py
 import os
+import re
+import threading
 from dotenv import load_dotenv, set_key, dotenv_values
 
+# SERVICE_API_KEY, and SERVICE_API_KEY_1 .. SERVICE_API_KEY_N for a pool of keys
+API_KEY_PATTERN = re.compile(r'^(\w+?)_API_KEY(?:_(\d+))?$')
+
 class APIManager:
-    def __init__(self):
-        self.env_file = '.env'
+    def __init__(self, env_file='.env'):
+        self.env_file = env_file
+        self.lock = threading.RLock()  # The manager from get_api_manager is shared across threads
         self.ensure_env_file()
-        load_dotenv(self.env_file)  # Load environment variables from .env file
-        self.api_keys = self.load_env_api_keys()
+        self.load()
+
+    def env_stamp(self):
+        # (mtime, size) of the .env file; any rewrite of the file changes it
+        try:
+            stat = os.stat(self.env_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self):
+        with self.lock:
+            self.loaded_stamp = self.env_stamp()
+            load_dotenv(self.env_file)  # Load environment variables from .env file
+            self.key_pools = self.load_env_key_pools()
+            self.api_keys = {service: keys[0] for service, keys in self.key_pools.items()}
+
+    def reload_if_changed(self):
+        """
+        Re-reads the .env file if it changed since it was loaded, e.g. when it was edited by
+        hand or by another APIManager. A stat call is all it costs when nothing changed.
+
+        Returns:
+            bool: True if the keys were reloaded.
+        """
+        if self.env_stamp() == self.loaded_stamp:
+            return False
+        with self.lock:
+            if self.env_stamp() == self.loaded_stamp:
+                return False  # Another thread reloaded it
+            self.load()
+            return True
 
     def ensure_env_file(self):
         if not os.path.exists(self.env_file):
             open(self.env_file, 'w').close()  # Create an empty .env file if it doesn't exist
 
     def load_env_api_keys(self):
-        # Load API keys from environment variables if available
+        # Load API keys from environment variables if available; the first key of each pool
+        return {service: keys[0] for service, keys in self.load_env_key_pools().items()}
+
+    def load_env_key_pools(self):
+        # All non-empty keys of each service: SERVICE_API_KEY first, then SERVICE_API_KEY_<n> by n
         env_values = dotenv_values(self.env_file)
-        api_keys = {}
+        numbered = {}
         for key, value in env_values.items():
-            if key.endswith('_API_KEY'):
-                service = key.replace('_API_KEY', '').lower()
-                api_keys[service] = value
-        return api_keys
+            match = API_KEY_PATTERN.match(key)
+            if match and value:
+                service = match.group(1).lower()
+                number = int(match.group(2)) if match.group(2) else 0
+                numbered.setdefault(service, []).append((number, value))
+        key_pools = {}
+        for service, keys in numbered.items():
+            key_pools[service] = []
+            for _, value in sorted(keys):
+                if value not in key_pools[service]:  # The same key listed twice is one quota
+                    key_pools[service].append(value)
+        return key_pools
 
     def save_api_key(self, service, api_key):
         # Save API key to .env file
-        set_key(self.env_file, f'{service.upper()}_API_KEY', api_key)
+        with self.lock:
+            set_key(self.env_file, f'{service.upper()}_API_KEY', api_key)
+            self.load()
+
+    def append_api_key(self, service, api_key):
+        # Add another key to a service's pool as the next free SERVICE_API_KEY_<n>
+        with self.lock:
+            env_values = dotenv_values(self.env_file)
+            numbers = [int(match.group(2)) for match in map(API_KEY_PATTERN.match, env_values)
+                       if match and match.group(2) and match.group(1).lower() == service.lower()]
+            set_key(self.env_file, f'{service.upper()}_API_KEY_{max(numbers, default=0) + 1}', api_key)
+            self.load()
 
     def remove_api_key(self, service):
-        # Remove API key from .env file
-        set_key(self.env_file, f'{service.upper()}_API_KEY', '')
+        # Remove API key from .env file, including every key of its pool
+        with self.lock:
+            for key in dotenv_values(self.env_file):
+                match = API_KEY_PATTERN.match(key)
+                if match and match.group(1).lower() == service.lower():
+                    set_key(self.env_file, key, '')
+            self.load()
 
     def get_api_key(self, service):
+        self.reload_if_changed()
         return self.api_keys.get(service)
 
+    def get_api_keys(self, service):
+        # Every key of the service's pool; a single-key service gives a one-item list
+        self.reload_if_changed()
+        return list(self.key_pools.get(service, []))
+
     def add_api_key_interactive(self):
         service = input("Enter the name of the service (e.g., 'openai', 'groq'): ").strip()
         api_key = input(f"Enter the API key for {service}: ").strip()
@@ -51,10 +121,13 @@ class APIManager:
             print(f"No API key found for {service}.")
 
     def list_api_keys(self):
+        self.reload_if_changed()
         if self.api_keys:
             print("Stored API keys:")
             for service, key in self.api_keys.items():
-                print(f"{service}: {key[:4]}...{key[-4:]}")  # Show only partial keys for security
+                pool_size = len(self.key_pools.get(service, []))
+                extra = f" (+{pool_size - 1} more)" if pool_size > 1 else ""
+                print(f"{service}: {key[:4]}...{key[-4:]}{extra}")  # Show only partial keys for security
         else:
             print("No API keys stored.")
 
@@ -72,3 +145,20 @@ class APIManager:
                     self.remove_api_key(api_name)
             elif action == 'l':
                 self.list_api_keys()
+
+
+_managers = {}  # absolute .env path -> APIManager
+_managers_lock = threading.Lock()
+
+def get_api_manager(env_file='.env'):
+    """
+    Returns the process-wide APIManager of an .env file. It is built once and reloads its keys
+    only when the file changes, so callers can ask for it as often as they like instead of
+    re-parsing the file in every constructor.
+    """
+    path = os.path.abspath(env_file)
+    with _managers_lock:
+        manager = _managers.get(path)
+        if manager is None:
+            manager = _managers[path] = APIManager(env_file)
+        return manager
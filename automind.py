@@ -55,6 +55,14 @@ class FundamentalAGI:
         conclusion = self.agi.reasoning.draw_conclusion()
         return conclusion
 
+    async def get_conclusion_from_agi_async(self, prompt, on_partial=None):
+        """
+        Async counterpart of get_conclusion_from_agi; chatter calls run natively on the event loop.
+        on_partial, if given, receives each conclusion's text as it streams in.
+        """
+        self.agi.reasoning.add_premise(prompt)
+        return await self.agi.reasoning.draw_conclusion_async(on_partial=on_partial)
+
 def main():
     openai_key = input("Enter OpenAI API Key: ").strip()
     groq_key = input("Enter Groq API Key: ").strip()
@@ -2,8 +2,8 @@ import logging
 from logic import LogicTables
 from SocraticReasoning import SocraticReasoning
 from memory.memory import store_in_stm, DialogEntry
-from chatter import GPT4o
-from api import APIManager
+from chatter import GPT4o, get_chatter
+from api import get_api_manager
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -16,11 +16,20 @@ class Belief:
     def __init__(self, belief):
         self.belief = belief
         self.logic = LogicTables()  # Initialize LogicTables class for logical operations
-        self.api_manager = APIManager()  # Initialize APIManager for managing API keys
+        self.api_manager = get_api_manager()  # Shared APIManager; re-reads .env only when it changes
         api_key = self.api_manager.get_api_key('gpt4o')  # Retrieve the API key for the chatter service
         if not api_key:
             raise ValueError("API key for GPT4o is missing. Please add it using APIManager.")
-        self.socratic = SocraticReasoning(GPT4o(api_key))  # Initialize SocraticReasoning class with a chatter instance
+        self.chatter = get_chatter(GPT4o, api_key)  # One shared chatter and connection pool per key
+        self._socratic = None
+
+    @property
+    def socratic(self):
+        # SocraticReasoning replays the premise journal and attaches log handlers, so it is only
+        # built for beliefs that are actually reasoned about
+        if self._socratic is None:
+            self._socratic = SocraticReasoning(self.chatter, session=f"belief:{self.belief}")
+        return self._socratic
 
     def __str__(self):
         return self.belief
@@ -0,0 +1,120 @@
+import threading
+import time
+
+# Resource budget for one reasoning run, shared by SocraticReasoning and the chatter classes.
+#
+# Reason codes for a run that stops early:
+#   'deadline'   wall-clock deadline passed
+#   'llm_calls'  maximum number of LLM calls made
+#   'tokens'     maximum number of tokens used
+#   'retries'    too many generated premises were rejected
+# A run stopped by a chatter call that failed after its retries reports 'provider_error'.
+# A run that finishes normally reports 'validated' or 'max_premises'.
+
+LIMIT_REASONS = ('deadline', 'llm_calls', 'tokens', 'retries')
+PROVIDER_ERROR = 'provider_error'
+STOP_REASONS = LIMIT_REASONS + (PROVIDER_ERROR,)
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+class ReasoningBudget:
+    """
+    Limits for a single reasoning run. Any limit left as None is not enforced.
+
+    Args:
+        deadline: Wall-clock seconds allowed from start().
+        max_llm_calls: The maximum number of chatter calls.
+        max_tokens: The maximum number of tokens across all calls.
+        max_retries: The maximum number of rejected generations.
+    """
+    def __init__(self, deadline=None, max_llm_calls=None, max_tokens=None, max_retries=None):
+        self.deadline = deadline
+        self.max_llm_calls = max_llm_calls
+        self.max_tokens = max_tokens
+        self.max_retries = max_retries
+        self.llm_calls = 0
+        self.tokens = 0
+        self.retries = 0
+        self.started = None
+        self.lock = threading.Lock()  # Chatter calls may charge from worker threads
+
+    def start(self):
+        if self.started is None:
+            self.started = time.monotonic()
+        return self
+
+    def elapsed(self):
+        return 0.0 if self.started is None else time.monotonic() - self.started
+
+    def remaining_time(self):
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - self.elapsed())
+
+    def remaining_tokens(self):
+        if self.max_tokens is None:
+            return None
+        return max(0, self.max_tokens - self.tokens)
+
+    def check(self):
+        """
+        Raises BudgetExceeded if any limit has been reached.
+        """
+        self.start()
+        if self.deadline is not None and self.elapsed() >= self.deadline:
+            raise BudgetExceeded('deadline', f"Deadline of {self.deadline}s reached")
+        if self.max_llm_calls is not None and self.llm_calls >= self.max_llm_calls:
+            raise BudgetExceeded('llm_calls', f"Limit of {self.max_llm_calls} LLM calls reached")
+        if self.max_tokens is not None and self.tokens >= self.max_tokens:
+            raise BudgetExceeded('tokens', f"Limit of {self.max_tokens} tokens reached")
+        if self.max_retries is not None and self.retries > self.max_retries:
+            raise BudgetExceeded('retries', f"Limit of {self.max_retries} retries reached")
+
+    def cap_tokens(self, max_tokens):
+        """
+        Returns the per-call max_tokens limited by what is left of the token budget.
+        """
+        remaining = self.remaining_tokens()
+        if remaining is None:
+            return max_tokens
+        return remaining if max_tokens is None else min(max_tokens, remaining)
+
+    def charge_call(self, tokens=0):
+        with self.lock:
+            self.llm_calls += 1
+            self.tokens += tokens or 0
+
+    def charge_retry(self):
+        with self.lock:
+            self.retries += 1
+        self.check()
+
+    def usage(self):
+        return {'llm_calls': self.llm_calls, 'tokens': self.tokens, 'retries': self.retries, 'elapsed': self.elapsed()}
+
+
+class ReasoningResult:
+    """
+    Outcome of a reasoning run.
+
+    Attributes:
+        conclusion: The conclusion reached, possibly from an unfinished run.
+        premises: The premises at the end of the run.
+        reason: 'validated', 'max_premises' or one of STOP_REASONS.
+        partial: True when the run was stopped by a budget limit or a provider error.
+        usage: LLM calls, tokens, retries and elapsed seconds.
+    """
+    def __init__(self, conclusion, premises, reason, usage):
+        self.conclusion = conclusion
+        self.premises = list(premises)
+        self.reason = reason
+        self.partial = reason in STOP_REASONS
+        self.usage = usage
+
+    def __repr__(self):
+        return f"ReasoningResult(reason={self.reason!r}, partial={self.partial}, conclusion={self.conclusion!r})"
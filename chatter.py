@@ -1,71 +1,536 @@
 # chatter.py
+import asyncio
+import email.utils
+import inspect
+import random
+import threading
+import time
+import weakref
+import httpx
 import openai
-from groq import Groq
+import groq
+from openai import AsyncOpenAI, OpenAI
+from groq import AsyncGroq, Groq
 import logging
+from budget import BudgetExceeded
+from ratelimit import get_limiter, key_id
+
+# Connection pool shared by the async clients of every chatter: bounded, with keep-alive
+ASYNC_POOL_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+_async_http_clients = weakref.WeakKeyDictionary()  # event loop -> httpx.AsyncClient
+
+def get_async_http_client():
+    # Connections belong to the event loop that opened them, so each running loop gets one pool
+    loop = asyncio.get_running_loop()
+    client = _async_http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(limits=ASYNC_POOL_LIMITS, timeout=httpx.Timeout(600.0, connect=5.0))
+        _async_http_clients[loop] = client
+    return client
+
+def pooled_async_client(clients, factory):
+    # Returns the SDK client for the running loop from clients, creating it on the shared pool
+    loop = asyncio.get_running_loop()
+    client = clients.get(loop)
+    if client is None:
+        client = clients[loop] = factory(get_async_http_client())
+    return client
+
+class ChatterError(Exception):
+    """
+    A chatter call that failed after any retries.
+
+    Attributes:
+        provider: 'openai', 'groq' or 'ollama'.
+        status: The HTTP status, or None for connection errors and timeouts.
+        retry_after: Seconds the provider asked to wait, or None.
+    """
+    retryable = False
+
+    def __init__(self, provider, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.provider = provider
+        self.status = status
+        self.retry_after = retry_after
+
+class RateLimitExceeded(ChatterError):
+    # 429 Too Many Requests
+    retryable = True
+
+class ProviderUnavailable(ChatterError):
+    # 5xx, 408, 409, timeouts and connection errors
+    retryable = True
+
+class RequestRejected(ChatterError):
+    # Any other 4xx, e.g. a bad key, an unknown model or an exhausted quota; retrying cannot help
+    pass
+
+CONNECTION_ERRORS = (openai.APIConnectionError, groq.APIConnectionError, httpx.TransportError)
+SDK_ERRORS = (openai.APIError, groq.APIError)
+
+def parse_retry_after(headers):
+    # Retry-After is seconds or an HTTP date; OpenAI also sends retry-after-ms
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000.0
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+def classify_error(provider, error):
+    """
+    Maps an SDK or transport exception to a ChatterError, or returns None for other exceptions.
+    """
+    if isinstance(error, CONNECTION_ERRORS):
+        return ProviderUnavailable(provider, f"{provider} api unreachable: {error}")
+    if not isinstance(error, SDK_ERRORS):
+        return None
+    status = getattr(error, 'status_code', None)
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    retry_after = parse_retry_after(headers)
+    message = f"{provider} api error: {error}"
+    if status == 429 and getattr(error, 'code', None) != 'insufficient_quota':
+        return RateLimitExceeded(provider, message, status, retry_after)
+    if status is not None and (status in (408, 409) or status >= 500):
+        return ProviderUnavailable(provider, message, status, retry_after)
+    return RequestRejected(provider, message, status, retry_after)
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for retryable chatter errors.
+
+    Args:
+        max_attempts: The number of attempts, including the first.
+        base_delay: The backoff ceiling of the first retry in seconds; it doubles per retry.
+        max_delay: The largest backoff ceiling in seconds.
+        retry_rate_limits: Retry 429s; a key pool turns this off to move to another key instead.
+    """
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=30.0, retry_rate_limits=True):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_rate_limits = retry_rate_limits
+
+    def delay(self, attempt, retry_after=None):
+        # A Retry-After from the provider is a lower bound on the jittered backoff
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(backoff, retry_after or 0.0)
+
+# Tokens assumed for the completion when max_tokens is not set, for the token bucket estimate
+DEFAULT_COMPLETION_TOKENS = 512
+
+def estimate_tokens(messages, max_tokens):
+    # About four characters per token for the prompt, plus the completion limit
+    prompt_chars = sum(len(message.get('content') or '') for message in messages)
+    return prompt_chars // 4 + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+class RequestAttempts:
+    """
+    Rate limiting and retries around one chat completion request.
+
+    Args:
+        provider: The provider name used for the shared limiter and in errors.
+        messages: The request messages, used to estimate its tokens.
+        max_tokens: The per-call completion limit.
+        budget: The ReasoningBudget charged for the call, or None.
+        policy: The RetryPolicy.
+        key: The key_id of the chatter's API key, for its own limiter.
+    """
+    def __init__(self, provider, messages, max_tokens, budget, policy, key=None):
+        self.provider = provider
+        self.max_tokens = max_tokens
+        self.budget = budget
+        self.policy = policy
+        self.limiter = get_limiter(provider, key)
+        self.estimate = estimate_tokens(messages, max_tokens)
+        self.attempt = 0
+
+    def options(self):
+        # Checks the budget and returns the request options, or raises BudgetExceeded
+        return completion_options(self.max_tokens, self.budget)
+
+    def max_wait(self):
+        return self.budget.remaining_time() if self.budget is not None else None
+
+    def limited(self):
+        raise BudgetExceeded('deadline', f"Waiting for the {self.provider} rate limit would pass the deadline")
+
+    def succeeded(self, response):
+        self.charge(getattr(response, 'usage', None))
+        return response
+
+    def charge(self, usage):
+        # Corrects the limiter and charges the budget once per call from the reported usage
+        used = getattr(usage, 'total_tokens', None)
+        if used is not None:
+            self.limiter.settle(self.estimate, used)
+        if self.budget is not None:
+            self.budget.charge_call(used or 0)
+
+    def failed(self, error):
+        """
+        Returns the seconds to wait before retrying, or raises the error as a ChatterError.
+        """
+        self.limiter.settle(self.estimate, 0)  # A failed request used no tokens
+        chatter_error = classify_error(self.provider, error)
+        if chatter_error is None:
+            raise error
+        if isinstance(chatter_error, RateLimitExceeded) and chatter_error.retry_after:
+            self.limiter.pause(chatter_error.retry_after)
+        self.attempt += 1
+        rate_limited = isinstance(chatter_error, RateLimitExceeded)
+        if (not chatter_error.retryable or self.attempt >= self.policy.max_attempts
+                or (rate_limited and not self.policy.retry_rate_limits)):
+            raise chatter_error from error
+        delay = self.policy.delay(self.attempt - 1, chatter_error.retry_after)
+        remaining = self.max_wait()
+        if remaining is not None and delay >= remaining:
+            raise chatter_error from error
+        logging.warning(f"{chatter_error}; retry {self.attempt} in {delay:.2f}s")
+        return delay
+
+def send_request(provider, create, messages, max_tokens, budget, policy, key=None):
+    """
+    Calls create(options) under the shared rate limits of the provider, or of the API key
+    with key_id key, retrying retryable errors.
+
+    Returns:
+        The SDK response.
+
+    Raises:
+        ChatterError: The request failed and cannot be retried any more.
+        BudgetExceeded: The budget ran out, including while waiting for the rate limit.
+    """
+    attempts = RequestAttempts(provider, messages, max_tokens, budget, policy, key)
+    while True:
+        options = attempts.options()
+        if not attempts.limiter.acquire(attempts.estimate, attempts.max_wait()):
+            attempts.limited()
+        try:
+            response = create(options)
+        except Exception as e:
+            time.sleep(attempts.failed(e))
+            continue
+        return attempts.succeeded(response)
+
+async def attempt_async(attempts, create):
+    # Awaits create(options) under the rate limits, retrying until it succeeds or raises
+    while True:
+        options = attempts.options()
+        if not await attempts.limiter.acquire_async(attempts.estimate, attempts.max_wait()):
+            attempts.limited()
+        try:
+            return await create(options)
+        except Exception as e:
+            await asyncio.sleep(attempts.failed(e))
+
+async def send_request_async(provider, create, messages, max_tokens, budget, policy, key=None):
+    """
+    Async counterpart of send_request; create(options) returns an awaitable.
+    """
+    attempts = RequestAttempts(provider, messages, max_tokens, budget, policy, key)
+    return attempts.succeeded(await attempt_async(attempts, create))
+
+def stream_usage(chunk):
+    # OpenAI reports usage on the last chunk when asked to; Groq reports it under x_groq
+    return getattr(chunk, 'usage', None) or getattr(getattr(chunk, 'x_groq', None), 'usage', None)
+
+async def stream_request_async(provider, create, messages, max_tokens, budget, policy, key=None):
+    """
+    Streaming counterpart of send_request_async: create(options) opens a stream=True completion
+    and the text deltas are yielded as they arrive. Errors raised before the stream opens are
+    retried as in send_request; later ones are raised as ChatterError, since part of the reply
+    has already been passed on. The budget and limiter are charged when the stream ends.
+    """
+    attempts = RequestAttempts(provider, messages, max_tokens, budget, policy, key)
+    stream = await attempt_async(attempts, create)
+    usage = None
+    try:
+        async for chunk in stream:
+            usage = stream_usage(chunk) or usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+    except Exception as e:
+        chatter_error = classify_error(provider, e)
+        if chatter_error is None:
+            raise
+        raise chatter_error from e
+    finally:
+        attempts.charge(usage)
+        await stream.close()
+
+async def stream_from(chatter, knowledge, **options):
+    """
+    Yields a chatter's response in chunks: streamed if the chatter has stream_response_async,
+    otherwise as a single chunk from generate_response_async, or from generate_response run
+    in a thread.
+    """
+    stream = getattr(chatter, 'stream_response_async', None)
+    if stream is not None:
+        async for chunk in stream(knowledge, **options):
+            yield chunk
+        return
+    generate = getattr(chatter, 'generate_response_async', None)
+    if generate is None:
+        yield await asyncio.to_thread(chatter.generate_response, knowledge, **options)
+    else:
+        yield await generate(knowledge, **options)
+
+def is_error_response(response):
+    # Chatters that report API failures as text rather than raising ChatterError start it with 'error:'
+    return not isinstance(response, str) or response.startswith("error: unable to generate a response")
+
+def completion_options(max_tokens, budget):
+    # Request options shared by the chatter classes; a budget caps tokens and time per call
+    options = {}
+    if budget is not None:
+        budget.check()
+        max_tokens = budget.cap_tokens(max_tokens)
+        remaining_time = budget.remaining_time()
+        if remaining_time is not None:
+            options['timeout'] = remaining_time
+    if max_tokens is not None:
+        options['max_tokens'] = max_tokens
+    return options
 
 class GPT4o:
-    def __init__(self, openai_api_key):
+    provider = 'openai'
+
+    def __init__(self, openai_api_key, retry_policy=None):
         self.openai_api_key = openai_api_key
         openai.api_key = self.openai_api_key
+        # Retries are done by send_request, under the shared rate limiter
+        self.client = OpenAI(api_key=openai_api_key, max_retries=0)
+        self.key_id = key_id(openai_api_key)  # Each key has its own rate limits
+        self.async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncOpenAI
+        self.retry_policy = retry_policy or RetryPolicy()
 
-    def generate_response(self, knowledge, model="gpt-4o"):
-        prompt = f"{knowledge}"
-        try:
-            response = openai.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": ""},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            decision = response.choices[0].message.content
-            return decision.lower()
-        except openai.APIError as e:
-            logging.error(f"openai api error: {e}")
-            return "error: unable to generate a response due to an issue with the openai api."
+    @staticmethod
+    def messages(knowledge):
+        return [
+            {"role": "system", "content": ""},
+            {"role": "user", "content": f"{knowledge}"}
+        ]
+
+    def generate_response(self, knowledge, model="gpt-4o", max_tokens=None, budget=None):
+        messages = self.messages(knowledge)
+        response = send_request(self.provider, lambda options: self.client.chat.completions.create(
+            model=model, messages=messages, **options), messages, max_tokens, budget, self.retry_policy, self.key_id)
+        decision = response.choices[0].message.content
+        return decision.lower()
+
+    def async_client(self):
+        return pooled_async_client(self.async_clients, lambda http_client: AsyncOpenAI(
+            api_key=self.openai_api_key, http_client=http_client, max_retries=0))
+
+    async def generate_response_async(self, knowledge, model="gpt-4o", max_tokens=None, budget=None):
+        messages = self.messages(knowledge)
+        client = self.async_client()
+        response = await send_request_async(self.provider, lambda options: client.chat.completions.create(
+            model=model, messages=messages, **options), messages, max_tokens, budget, self.retry_policy, self.key_id)
+        decision = response.choices[0].message.content
+        return decision.lower()
+
+    async def stream_response_async(self, knowledge, model="gpt-4o", max_tokens=None, budget=None):
+        messages = self.messages(knowledge)
+        client = self.async_client()
+        async for delta in stream_request_async(self.provider, lambda options: client.chat.completions.create(
+                model=model, messages=messages, stream=True, stream_options={"include_usage": True}, **options),
+                messages, max_tokens, budget, self.retry_policy, self.key_id):
+            yield delta.lower()
 
 class GroqModel:
-    def __init__(self, groq_api_key):
-        self.client = Groq(api_key=groq_api_key)
+    provider = 'groq'
 
-    def generate_response(self, knowledge, model="mixtral-8x7b-32768"):
-        prompt = f"{knowledge}"
-        try:
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": ""},
-                    {"role": "user", "content": prompt}
-                ],
-                model=model,
-            )
-            decision = chat_completion.choices[0].message.content
-            return decision.lower()
-        except Exception as e:
-            logging.error(f"groq api error: {e}")
-            return "error: unable to generate a response due to an issue with the groq api."
+    def __init__(self, groq_api_key, retry_policy=None):
+        self.groq_api_key = groq_api_key
+        self.client = Groq(api_key=groq_api_key, max_retries=0)
+        self.key_id = key_id(groq_api_key)  # Each key has its own rate limits
+        self.async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncGroq
+        self.retry_policy = retry_policy or RetryPolicy()
+
+    @staticmethod
+    def messages(knowledge):
+        return [
+            {"role": "system", "content": ""},
+            {"role": "user", "content": f"{knowledge}"}
+        ]
+
+    def generate_response(self, knowledge, model="mixtral-8x7b-32768", max_tokens=None, budget=None):
+        messages = self.messages(knowledge)
+        chat_completion = send_request(self.provider, lambda options: self.client.chat.completions.create(
+            messages=messages, model=model, **options), messages, max_tokens, budget, self.retry_policy, self.key_id)
+        decision = chat_completion.choices[0].message.content
+        return decision.lower()
+
+    def async_client(self):
+        return pooled_async_client(self.async_clients, lambda http_client: AsyncGroq(
+            api_key=self.groq_api_key, http_client=http_client, max_retries=0))
+
+    async def generate_response_async(self, knowledge, model="mixtral-8x7b-32768", max_tokens=None, budget=None):
+        messages = self.messages(knowledge)
+        client = self.async_client()
+        chat_completion = await send_request_async(self.provider, lambda options: client.chat.completions.create(
+            messages=messages, model=model, **options), messages, max_tokens, budget, self.retry_policy, self.key_id)
+        decision = chat_completion.choices[0].message.content
+        return decision.lower()
+
+    async def stream_response_async(self, knowledge, model="mixtral-8x7b-32768", max_tokens=None, budget=None):
+        messages = self.messages(knowledge)
+        client = self.async_client()
+        async for delta in stream_request_async(self.provider, lambda options: client.chat.completions.create(
+                messages=messages, model=model, stream=True, **options),
+                messages, max_tokens, budget, self.retry_policy, self.key_id):
+            yield delta.lower()
 
 class OllamaModel:
-    def __init__(self):
+    provider = 'ollama'
+
+    def __init__(self, retry_policy=None):
         self.client = OpenAI(
             base_url='http://localhost:11434/v1',
             api_key='ollama',  # required, but unused
+            max_retries=0,
         )
+        self.key_id = None
+        self.async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncOpenAI
+        self.retry_policy = retry_policy or RetryPolicy()
 
-    def generate_response(self, knowledge, model="llama2"):
-        prompt = [
+    @staticmethod
+    def messages(knowledge):
+        return [
             {"role": "system", "content": ""},
             {"role": "assistant", "content": ""},
             {"role": "tool", "content": ""},
             {"role": "user", "content": f"{knowledge}"}
         ]
-        try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=prompt
-            )
-            decision = response.choices[0].message.content
-            return decision.lower()
-        except Exception as e:
-            logging.error(f"ollama api error: {e}")
-            return "error: unable to generate a response due to an issue with the ollama api."
 
+    def generate_response(self, knowledge, model="llama2", max_tokens=None, budget=None):
+        messages = self.messages(knowledge)
+        response = send_request(self.provider, lambda options: self.client.chat.completions.create(
+            model=model, messages=messages, **options), messages, max_tokens, budget, self.retry_policy, self.key_id)
+        decision = response.choices[0].message.content
+        return decision.lower()
+
+    def async_client(self):
+        return pooled_async_client(self.async_clients, lambda http_client: AsyncOpenAI(
+            base_url='http://localhost:11434/v1', api_key='ollama', http_client=http_client, max_retries=0))
+
+    async def generate_response_async(self, knowledge, model="llama2", max_tokens=None, budget=None):
+        messages = self.messages(knowledge)
+        client = self.async_client()
+        response = await send_request_async(self.provider, lambda options: client.chat.completions.create(
+            model=model, messages=messages, **options), messages, max_tokens, budget, self.retry_policy, self.key_id)
+        decision = response.choices[0].message.content
+        return decision.lower()
+
+    async def stream_response_async(self, knowledge, model="llama2", max_tokens=None, budget=None):
+        messages = self.messages(knowledge)
+        client = self.async_client()
+        async for delta in stream_request_async(self.provider, lambda options: client.chat.completions.create(
+                model=model, messages=messages, stream=True, **options),
+                messages, max_tokens, budget, self.retry_policy, self.key_id):
+            yield delta.lower()
+
+_chatters = {}  # (chatter class, api key, retry_rate_limits) -> chatter
+_chatters_lock = threading.Lock()
+
+def get_chatter(chatter_class, api_key=None, retry_rate_limits=True):
+    """
+    Returns the process-wide chatter of chatter_class for api_key, so everything using the same
+    key shares one set of SDK clients and connection pools instead of building its own.
+
+    Args:
+        chatter_class: GPT4o, GroqModel or OllamaModel.
+        api_key: The API key; None for OllamaModel.
+        retry_rate_limits: False for the member chatters of a key pool, which leave 429s to the pool.
+    """
+    name = (chatter_class, api_key, retry_rate_limits)
+    with _chatters_lock:
+        chatter = _chatters.get(name)
+        if chatter is None:
+            options = {} if retry_rate_limits else {'retry_policy': RetryPolicy(retry_rate_limits=False)}
+            chatter = chatter_class(api_key, **options) if api_key is not None else chatter_class(**options)
+            _chatters[name] = chatter
+        return chatter
+
+class ChatterWrapper:
+    """
+    Base for layers (caching, coalescing) that wrap a chatter and keep its generate_response
+    interface, so layers can be stacked and used wherever a chatter is expected.
+
+    Args:
+        chatter: The chatter or wrapper being wrapped.
+    """
+    def __init__(self, chatter):
+        self.chatter = chatter
+
+    def __getattr__(self, name):
+        if name == 'chatter':
+            raise AttributeError(name)
+        return getattr(self.chatter, name)
+
+    @property
+    def backend(self):
+        # The class name of the innermost chatter, e.g. 'GPT4o'
+        chatter = self.chatter
+        return chatter.backend if isinstance(chatter, ChatterWrapper) else type(chatter).__name__
+
+    @property
+    def default_model(self):
+        chatter = self.chatter
+        if isinstance(chatter, ChatterWrapper):
+            return chatter.default_model
+        parameter = inspect.signature(chatter.generate_response).parameters.get('model')
+        return None if parameter is None or parameter.default is inspect.Parameter.empty else parameter.default
+
+    def forward(self, knowledge, model=None, **options):
+        """
+        Calls the wrapped chatter; cache options are only passed on to other wrappers.
+        """
+        if model is not None:
+            options['model'] = model
+        if not isinstance(self.chatter, ChatterWrapper):
+            options.pop('bypass_cache', None)
+        return self.chatter.generate_response(knowledge, **options)
+
+    async def forward_async(self, knowledge, model=None, **options):
+        """
+        Async counterpart of forward; a chatter without generate_response_async runs in a thread.
+        """
+        if model is not None:
+            options['model'] = model
+        if not isinstance(self.chatter, ChatterWrapper):
+            options.pop('bypass_cache', None)
+        generate = getattr(self.chatter, 'generate_response_async', None)
+        if generate is None:
+            return await asyncio.to_thread(self.chatter.generate_response, knowledge, **options)
+        return await generate(knowledge, **options)
+
+    async def forward_stream(self, knowledge, model=None, **options):
+        """
+        Streaming counterpart of forward, see stream_from.
+        """
+        if model is not None:
+            options['model'] = model
+        if not isinstance(self.chatter, ChatterWrapper):
+            options.pop('bypass_cache', None)
+        async for chunk in stream_from(self.chatter, knowledge, **options):
+            yield chunk
+
+    def generate_response(self, knowledge, model=None, **options):
+        return self.forward(knowledge, model, **options)
+
+    async def generate_response_async(self, knowledge, model=None, **options):
+        return await self.forward_async(knowledge, model, **options)
+
+    async def stream_response_async(self, knowledge, model=None, **options):
+        async for chunk in self.forward_stream(knowledge, model, **options):
+            yield chunk
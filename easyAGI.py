@@ -1,14 +1,15 @@
 # easyAGI (c) Gregory L. Magnusson MIT license 2024
 import logging
 import asyncio
-import concurrent.futures
 from nicegui import ui, app
 from memory.memory import create_memory_folders, store_in_stm, DialogEntry
-from api import APIManager
-from chatter import GPT4o, GroqModel
+from memory.jsonlog import NOT_PREMISE_LOG, THOUGHTS_LOG, format_log, get_jsonl_log
+from api import get_api_manager
+from router import build_router
+from response_cache import CachedChatter
+from similarity_cache import NearDuplicateChatter
+from singleflight import SingleFlightChatter
 from fastapi.staticfiles import StaticFiles
-import os
-import json
 from datetime import datetime
 from automind import FundamentalAGI
 
@@ -23,7 +24,7 @@ app.mount('/static', StaticFiles(directory='static'), name='static')
 
 class OpenMind:
     def __init__(self):
-        self.api_manager = APIManager()
+        self.api_manager = get_api_manager()
         self.agi_instance = None
         self.initialize_memory()
         self.initialize_agi()
@@ -76,28 +77,33 @@ class OpenMind:
                 ui.label('No API keys in storage')
 
     def initialize_agi(self):
-        openai_key = self.api_manager.get_api_key('openai')
-        groq_key = self.api_manager.get_api_key('groq')
+        openai_keys = self.api_manager.get_api_keys('openai')
+        groq_keys = self.api_manager.get_api_keys('groq')
 
-        if openai_key:
-            chatter = GPT4o(openai_key)
-        elif groq_key:
-            chatter = GroqModel(groq_key)
-        else:
+        # Route between the providers that have keys, spreading load over each provider's keys,
+        # with a local Ollama server as the last resort
+        chatter = build_router(openai_keys, groq_keys, hedge=True)
+        if chatter is None:
             self.agi_instance = None
             return
 
-        self.agi_instance = FundamentalAGI(chatter)
+        # reasoning_loop re-sends the same prompt every 10 seconds; answer repeats from the cache,
+        # then reworded premise requests from the near-duplicate cache (conclusion requests are
+        # only ever answered by exact repeats). Identical prompts sent at the same
+        # time by send_message and reasoning_loop share one call. SocraticReasoning bypasses all
+        # three for a prompt it repeats within one run, so each iteration gets a new answer.
+        self.agi_instance = FundamentalAGI(SingleFlightChatter(CachedChatter(NearDuplicateChatter(chatter))))
         logging.debug("AGI initialized")
 
-    async def get_conclusion_from_agi(self, prompt):
+    async def get_conclusion_from_agi(self, prompt, on_partial=None):
         """
         Get a conclusion from the AGI based on the provided prompt.
         This method is asynchronous to allow non-blocking operations.
+        on_partial, if given, receives the conclusion text as it streams in.
         """
         if self.agi_instance is None:
             return "AGI not initialized. Please add an API key."
-        conclusion = await asyncio.get_event_loop().run_in_executor(None, self.agi_instance.get_conclusion_from_agi, prompt)
+        conclusion = await self.agi_instance.get_conclusion_from_agi_async(prompt, on_partial)
         return conclusion
 
     def communicate_response(self, conclusion):
@@ -132,7 +138,7 @@ class OpenMind:
 
     def display_internal_conclusion(self, conclusion):
         """
-        Display the internal reasoning conclusion in the response window and log it to a JSON file.
+        Display the internal reasoning conclusion in the response window and append it to a JSONL log.
         """
         if conclusion != "No premises available for logic as conclusion.":
             with message_container:
@@ -147,21 +153,13 @@ class OpenMind:
             "timestamp": datetime.now().isoformat(),
             "conclusion": conclusion
         }
-        
+
         if conclusion == "No premises available for logic as conclusion.":
-            log_file_path = "./memory/logs/notpremise.json"
+            log_file_path = NOT_PREMISE_LOG
         else:
-            log_file_path = "./memory/logs/thoughts.json"
+            log_file_path = THOUGHTS_LOG
 
-        if not os.path.exists(log_file_path):
-            with open(log_file_path, 'w') as file:
-                json.dump([log_entry], file, indent=4)
-        else:
-            with open(log_file_path, 'r+') as file:
-                data = json.load(file)
-                data.append(log_entry)
-                file.seek(0)
-                json.dump(data, file, indent=4)
+        get_jsonl_log(log_file_path).append(log_entry)
 
     async def main_loop(self):
         """
@@ -181,10 +179,12 @@ class OpenMind:
         with message_container:
             ui.chat_message(text=question, name='query', sent=True)
             response_message = ui.chat_message(name='easyAGI', sent=False)
+            with response_message:
+                streamed = ui.html('')  # The conclusion as it streams in
             spinner = ui.spinner(type='dots')
 
         try:
-            conclusion = await self.get_conclusion_from_agi(question)
+            conclusion = await self.get_conclusion_from_agi(question, on_partial=streamed.set_content)
             response_message.clear()
             with response_message:
                 ui.html(conclusion)
@@ -211,8 +211,10 @@ class OpenMind:
 
     def read_log_file(self, file_path):
         """
-        Read the content of a log file and return it.
+        Read the content of a log file and return it. JSONL logs show their most recent entries.
         """
+        if file_path.endswith('.jsonl'):
+            return format_log(file_path)
         try:
             with open(file_path, 'r') as file:
                 return file.read()
@@ -241,8 +243,7 @@ openmind = OpenMind()
 
 @ui.page('/')
 def main():
-    global executor, message_container, log
-    executor = concurrent.futures.ThreadPoolExecutor()
+    global message_container, log
 
     async def send() -> None:
         question = text.value
@@ -264,10 +265,10 @@ def main():
         dark_mode_toggle = ui.button('Dark Mode', on_click=toggle_dark_mode).props('style="color: #ADD8E6; background-color: #1C3D5A; font-weight: bold; font-size: 16px; width: 150px; padding: 10px; border: 2px solid #1C3D5A; border-radius: 5px; transition: background-color 200ms ease-in-out, box-shadow 200ms ease-in-out;"').classes('ml-2 py-2 px-4 shadow-md hover:bg-blue-900 active:bg-blue-700')
         # Adding log file buttons
         log_files = {
-            "Premises Log": "./memory/logs/premises.json",
-            "Not Premise Log": "./memory/logs/notpremise.json",
+            "Premises Log": "./memory/logs/premises.jsonl",
+            "Not Premise Log": NOT_PREMISE_LOG,
             "Truth Tables Log": "./memory/logs/truth_tables.json",
-            "Thoughts Log": "./memory/logs/thoughts.json",
+            "Thoughts Log": THOUGHTS_LOG,
             "Conclusions Log": "./memory/logs/conclusions.txt",
             "Decisions Log": "./memory/logs/decisions.json"
         }
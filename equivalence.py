@@ -0,0 +1,107 @@
+import re
+from expression import compile_expression
+from logic import BitTruthTable
+
+# Equivalence classes of premises keyed by a canonical form.
+#
+# A premise that parses as a propositional formula is reduced to the variables it actually
+# depends on, and its canonical form is those variables (sorted) together with the packed
+# truth vector over them. Logically equivalent formulas therefore share a key however they
+# are written: 'A implication B', 'not A or B' and 'not (A and not B)' all collide, and so
+# do 'A or not A' and 'True'. Premises that are not formulas fall back to their text with
+# case, punctuation and spacing normalised.
+
+SIGNATURE_LIMIT = 16  # Formulas over more variables are keyed by their normalised syntax tree
+
+
+def normalize_text(text):
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text.lower()).split())
+
+
+def truth_signature(compiled):
+    variables = sorted(compiled.variables)
+    columns, mask = BitTruthTable.variable_columns(variables)
+    packed = compiled.evaluate_bits(columns, mask)
+    k = len(variables)
+    essential = []
+    for i, var in enumerate(variables):
+        half = 1 << (k - 1 - i)
+        # Rows with var False sit `half` rows after the matching rows with var True
+        if (packed & ~columns[var] & mask) >> half != packed & columns[var]:
+            essential.append(var)
+    if len(essential) < k:
+        columns, mask = BitTruthTable.variable_columns(essential)
+        for var in variables:
+            if var not in columns:
+                columns[var] = 0  # the function does not depend on it
+        packed = compiled.evaluate_bits(columns, mask)
+    return ('formula', tuple(essential), packed)
+
+
+def canonical_form(premise):
+    """
+    Returns a hashable canonical form; equivalent premises return equal forms.
+    """
+    try:
+        compiled = compile_expression(premise)
+    except Exception:
+        return ('text', normalize_text(premise))
+    if len(compiled.variables) > SIGNATURE_LIMIT:
+        return ('tree', repr(compiled.tree))
+    return truth_signature(compiled)
+
+
+class EquivalenceIndex:
+    """
+    Hash index from canonical form to the premises in that equivalence class.
+    """
+    def __init__(self):
+        self.classes = {}  # canonical form -> premises in insertion order
+        self.forms = {}  # premise -> canonical form
+
+    def form(self, premise):
+        form = self.forms.get(premise)
+        if form is None:
+            form = canonical_form(premise)
+        return form
+
+    def add(self, premise):
+        """
+        Adds a premise to its equivalence class.
+
+        Returns:
+            list: The premises that were already in the class.
+        """
+        form = self.form(premise)
+        members = self.classes.setdefault(form, [])
+        existing = list(members)
+        if premise not in self.forms:
+            self.forms[premise] = form
+            members.append(premise)
+        return existing
+
+    def equivalents(self, premise):
+        return list(self.classes.get(self.form(premise), []))
+
+    def discard(self, premise):
+        form = self.forms.pop(premise, None)
+        if form is None:
+            return
+        members = self.classes.get(form, [])
+        if premise in members:
+            members.remove(premise)
+        if not members:
+            self.classes.pop(form, None)
+
+    def remove_class(self, premise):
+        """
+        Removes and returns every premise equivalent to the given one.
+        """
+        members = self.classes.pop(self.form(premise), [])
+        for member in members:
+            self.forms.pop(member, None)
+        return members
+
+    def clear(self):
+        self.classes.clear()
+        self.forms.clear()
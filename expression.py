@@ -0,0 +1,318 @@
+import re
+
+# Propositional expression parser and compiler used by LogicTables.
+#
+# Grammar (lowest to highest binding):
+#   implication  :=  disjunction ( ('implication' | '->') implication )?      right associative
+#   disjunction  :=  exclusive ( ('or' | '|' | 'nor') exclusive )*
+#   exclusive    :=  conjunction ( ('xor' | '^') conjunction )*
+#   conjunction  :=  negation ( ('and' | '&' | 'nand') negation )*
+#   negation     :=  ('not' | '~' | '!') negation | primary
+#   primary      :=  NAME | 'True' | 'False' | '(' implication ')' | OPERATOR '(' implication ',' implication ')'
+#
+# The last primary form keeps the call syntax `xor(A, B)` accepted by the old eval() evaluator.
+
+BINARY_OPERATORS = {
+    'and': lambda x, y: x and y,
+    'or': lambda x, y: x or y,
+    'xor': lambda x, y: x ^ y,
+    'nand': lambda x, y: not (x and y),
+    'nor': lambda x, y: not (x or y),
+    'implication': lambda x, y: not x or y
+}
+
+# Bitwise forms over packed truth columns; `mask` has one bit set per truth-table row
+BITWISE_OPERATORS = {
+    'and': lambda x, y, mask: x & y,
+    'or': lambda x, y, mask: x | y,
+    'xor': lambda x, y, mask: x ^ y,
+    'nand': lambda x, y, mask: mask ^ (x & y),
+    'nor': lambda x, y, mask: mask ^ (x | y),
+    'implication': lambda x, y, mask: (mask ^ x) | y
+}
+
+SYMBOL_ALIASES = {'&': 'and', '|': 'or', '^': 'xor', '~': 'not', '!': 'not', '->': 'implication'}
+
+PRECEDENCE = [
+    ('or', 'nor'),
+    ('xor',),
+    ('and', 'nand')
+]
+
+TOKEN_PATTERN = re.compile(r'\s*(?:(->)|([A-Za-z_][A-Za-z0-9_]*)|([()&|^~!,]))')
+
+
+class LogicSyntaxError(ValueError):
+    pass
+
+
+class Node:
+    def variables(self):
+        raise NotImplementedError
+
+    def compile(self):
+        raise NotImplementedError
+
+    def evaluate_bits(self, columns, mask):
+        raise NotImplementedError
+
+
+class Variable(Node):
+    def __init__(self, name):
+        self.name = name
+
+    def variables(self):
+        return {self.name}
+
+    def compile(self):
+        name = self.name
+        return lambda values: values[name]
+
+    def evaluate_bits(self, columns, mask):
+        return columns[self.name]
+
+    def __repr__(self):
+        return self.name
+
+
+class Constant(Node):
+    def __init__(self, value):
+        self.value = value
+
+    def variables(self):
+        return set()
+
+    def compile(self):
+        value = self.value
+        return lambda values: value
+
+    def evaluate_bits(self, columns, mask):
+        return mask if self.value else 0
+
+    def __repr__(self):
+        return str(self.value)
+
+
+class Not(Node):
+    def __init__(self, operand):
+        self.operand = operand
+
+    def variables(self):
+        return self.operand.variables()
+
+    def compile(self):
+        operand = self.operand.compile()
+        return lambda values: not operand(values)
+
+    def evaluate_bits(self, columns, mask):
+        return mask ^ self.operand.evaluate_bits(columns, mask)
+
+    def __repr__(self):
+        return f"(not {self.operand!r})"
+
+
+class BinaryOp(Node):
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+    def variables(self):
+        return self.left.variables() | self.right.variables()
+
+    def compile(self):
+        left = self.left.compile()
+        right = self.right.compile()
+        # Specialise the common connectives so short-circuiting avoids a second call
+        if self.operator == 'and':
+            return lambda values: left(values) and right(values)
+        if self.operator == 'or':
+            return lambda values: left(values) or right(values)
+        if self.operator == 'implication':
+            return lambda values: not left(values) or right(values)
+        operator = BINARY_OPERATORS[self.operator]
+        return lambda values: operator(left(values), right(values))
+
+    def evaluate_bits(self, columns, mask):
+        left = self.left.evaluate_bits(columns, mask)
+        right = self.right.evaluate_bits(columns, mask)
+        return BITWISE_OPERATORS[self.operator](left, right, mask)
+
+    def __repr__(self):
+        return f"({self.left!r} {self.operator} {self.right!r})"
+
+
+class CompiledExpression:
+    """
+    A propositional expression parsed once and reusable across every row of a truth table.
+
+    Attributes:
+        source: The original expression string.
+        tree: The parsed syntax tree.
+        variables: The variable names referenced by the expression.
+    """
+    def __init__(self, source, tree):
+        self.source = source
+        self.tree = tree
+        self.variables = tree.variables()
+        self._evaluate = tree.compile()
+
+    def evaluate(self, values):
+        """
+        Evaluates the expression for a single assignment.
+
+        Args:
+            values: A mapping of variable name to truth value.
+
+        Returns:
+            bool: The truth value of the expression.
+        """
+        return bool(self._evaluate(values))
+
+    def evaluate_bits(self, columns, mask):
+        """
+        Evaluates the expression for every row of a truth table at once.
+
+        Args:
+            columns: A mapping of variable name to its packed column (bit i is row i).
+            mask: An int with one bit set for every row in the table.
+
+        Returns:
+            int: The packed result column.
+        """
+        return self.tree.evaluate_bits(columns, mask)
+
+    def __repr__(self):
+        return f"CompiledExpression({self.source!r})"
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if not match:
+            raise LogicSyntaxError(f"Unexpected character {text[position:].lstrip()[:1]!r} at position {position} in '{text}'")
+        arrow, word, symbol = match.groups()
+        token = arrow or word or symbol
+        lowered = token.lower()
+        if token in SYMBOL_ALIASES:
+            tokens.append(('op', SYMBOL_ALIASES[token]))
+        elif lowered in BINARY_OPERATORS or lowered == 'not':
+            tokens.append(('op', lowered))
+        elif lowered in ('true', 'false'):
+            tokens.append(('const', lowered == 'true'))
+        elif word:
+            tokens.append(('name', token))
+        else:
+            tokens.append(('punct', token))
+        position = match.end()
+    return tokens
+
+
+class Parser:
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def advance(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def expect(self, value):
+        kind, token = self.advance()
+        if token != value:
+            found = 'end of input' if kind is None else repr(token)
+            raise LogicSyntaxError(f"Expected {value!r} but found {found} in '{self.text}'")
+
+    def parse(self):
+        if not self.tokens:
+            raise LogicSyntaxError("Empty expression")
+        tree = self.parse_implication()
+        kind, token = self.peek()
+        if kind is not None:
+            raise LogicSyntaxError(f"Unexpected {token!r} in '{self.text}'")
+        return tree
+
+    def parse_implication(self):
+        left = self.parse_binary(0)
+        if self.peek() == ('op', 'implication'):
+            self.advance()
+            return BinaryOp('implication', left, self.parse_implication())
+        return left
+
+    def parse_binary(self, level):
+        if level == len(PRECEDENCE):
+            return self.parse_negation()
+        left = self.parse_binary(level + 1)
+        while True:
+            kind, token = self.peek()
+            if kind != 'op' or token not in PRECEDENCE[level]:
+                return left
+            self.advance()
+            left = BinaryOp(token, left, self.parse_binary(level + 1))
+
+    def parse_negation(self):
+        if self.peek() == ('op', 'not'):
+            self.advance()
+            return Not(self.parse_negation())
+        return self.parse_primary()
+
+    def parse_primary(self):
+        kind, token = self.advance()
+        if kind == 'name':
+            return Variable(token)
+        if kind == 'const':
+            return Constant(token)
+        if kind == 'punct' and token == '(':
+            tree = self.parse_implication()
+            self.expect(')')
+            return tree
+        if kind == 'op' and token in BINARY_OPERATORS and self.peek() == ('punct', '('):
+            self.advance()
+            left = self.parse_implication()
+            self.expect(',')
+            right = self.parse_implication()
+            self.expect(')')
+            return BinaryOp(token, left, right)
+        found = 'end of input' if kind is None else repr(token)
+        raise LogicSyntaxError(f"Unexpected {found} in '{self.text}'")
+
+
+def parse_expression(text):
+    """
+    Parses a propositional expression into a syntax tree.
+
+    Args:
+        text: The expression, e.g. 'A xor B' or 'not (A and B) implication C'.
+
+    Returns:
+        Node: The root of the syntax tree.
+
+    Raises:
+        LogicSyntaxError: If the expression is not well formed.
+    """
+    if not isinstance(text, str):
+        raise LogicSyntaxError(f"Expression must be a string, got {type(text).__name__}")
+    return Parser(text).parse()
+
+
+def compile_expression(text):
+    """
+    Parses and compiles a propositional expression into a reusable evaluator.
+
+    Args:
+        text: The expression to compile.
+
+    Returns:
+        CompiledExpression: The compiled expression.
+    """
+    return CompiledExpression(text, parse_expression(text))
@@ -0,0 +1,230 @@
+import re
+from expression import BINARY_OPERATORS, compile_expression
+
+# Structured conclusion extraction for SocraticReasoning.
+#
+# Free-text conclusions cannot be checked by LogicTables, so the model is asked to answer in a
+# fixed format that names its atomic propositions, restates the premises as formulas over them
+# and gives the conclusion both as a sentence and as a formula:
+#
+#     propositions:
+#     h = socrates is a human
+#     m = socrates is mortal
+#     premises:
+#     h implication m
+#     h
+#     conclusion: socrates is mortal
+#     formula: m
+#
+# extract_conclusion parses such a reply. The conclusion is valid when the premise formulas are
+# consistent and entail its formula, i.e. when
+# (premise1 and premise2 ...) implication formula is a tautology over the session's variables.
+
+RESERVED_NAMES = set(BINARY_OPERATORS) | {'not', 'true', 'false'}
+NAME_PATTERN = re.compile(r'^[a-z_][a-z0-9_]*$')
+HEADER_PATTERN = re.compile(r'^(propositions|atoms|premises|conclusion|formula)\s*:\s*(.*)$', re.IGNORECASE)
+DEFINITION_PATTERN = re.compile(r'^([A-Za-z_][A-Za-z0-9_]*)\s*[=:]\s*(.+)$')
+BULLET_PATTERN = re.compile(r'^[\s>#*\-]*(?:\d+[.)]\s+)?')
+CONCLUSION_LABEL_PATTERN = re.compile(r'^[ \t>#*\-]*conclusion[ \t*]*:', re.IGNORECASE | re.MULTILINE)
+SYMBOLS = {'→': '->', '=>': '->', '∧': '&', '∨': '|', '¬': '~', '⊕': '^'}
+
+FORMAT_INSTRUCTIONS = (
+    "Draw the conclusion that follows from the premises. Answer only in this format:\n"
+    "propositions:\n"
+    "<name> = <atomic statement>\n"
+    "premises:\n"
+    "<one formula per premise>\n"
+    "conclusion: <the conclusion in one sentence>\n"
+    "formula: <the conclusion as a formula>\n"
+    "Names are single lowercase words and known propositions keep their names. "
+    "Formulas combine names with and, or, not, xor, implication and parentheses."
+)
+
+
+def conclusion_prompt(premises, propositions=None):
+    """
+    Builds the prompt asking for a conclusion in the structured format.
+
+    Args:
+        premises: The premise statements.
+        propositions: Known propositions as {name: statement}.
+
+    Returns:
+        str: The prompt text.
+    """
+    lines = ["premises:"] + [f"- {premise}" for premise in premises]
+    if propositions:
+        lines += ["known propositions:"] + [f"{name} = {statement}" for name, statement in propositions.items()]
+    lines.append(FORMAT_INSTRUCTIONS)
+    return "\n".join(lines)
+
+
+class ExtractedConclusion:
+    """
+    A conclusion parsed from a structured model reply.
+
+    Attributes:
+        text: The conclusion sentence.
+        formula: The conclusion formula over the session's variables.
+        premises: The premise formulas given in the same reply.
+        propositions: The propositions declared in the reply as {name: statement}.
+        variables: Every variable used by formula and premises.
+    """
+    def __init__(self, text, formula, premises, propositions, variables):
+        self.text = text
+        self.formula = formula
+        self.premises = premises
+        self.propositions = propositions
+        self.variables = variables
+
+    def premise_formula(self):
+        return ' and '.join(f"({premise})" for premise in self.premises)
+
+    def entailment(self):
+        """
+        Returns the formula that is a tautology exactly when the premises entail the conclusion.
+        """
+        if not self.premises:
+            return self.formula
+        return f"({self.premise_formula()}) implication ({self.formula})"
+
+    def __repr__(self):
+        return f"ExtractedConclusion({self.text!r}, formula={self.formula!r})"
+
+
+class ConclusionStream:
+    """
+    Follows a structured reply while it streams in and reports its conclusion sentence as far
+    as it has arrived, so it can be shown before the rest of the reply is complete.
+
+    Attributes:
+        response: The reply received so far.
+        text: The conclusion sentence received so far.
+    """
+    def __init__(self):
+        self.response = ''
+        self.text = ''
+        self.label_end = None  # Offset just past 'conclusion:' once it has arrived
+
+    def feed(self, chunk):
+        """
+        Adds a chunk of the reply.
+
+        Returns:
+            str: The conclusion so far if this chunk extended it, otherwise None.
+        """
+        self.response += chunk
+        if self.label_end is None:
+            # The label is matched only once complete, so a partial 'conclu' is ignored
+            match = CONCLUSION_LABEL_PATTERN.search(self.response)
+            if match is None:
+                return None
+            self.label_end = match.end()
+        rest = self.response[self.label_end:]
+        if not rest.split('\n', 1)[0].strip(' \t*`'):
+            # 'conclusion:' on a line of its own; the sentence follows on the next line
+            rest = rest.split('\n', 1)[1] if '\n' in rest else ''
+        line = rest.split('\n', 1)[0]
+        if HEADER_PATTERN.match(clean_line(line)):
+            return None  # An empty conclusion section
+        text = line.replace('**', '').replace('`', '').strip()
+        if not text or text == self.text:
+            return None
+        self.text = text
+        return text
+
+
+def clean_line(line):
+    line = line.replace('**', '').replace('`', '')
+    line = BULLET_PATTERN.sub('', line, count=1) if not line.lstrip().startswith('->') else line
+    return line.strip().rstrip('.;').strip()
+
+
+def normalize_formula(formula, vocabulary):
+    """
+    Rewrites a formula onto the session's variable names, or returns None if it does not parse
+    or uses a name outside the vocabulary.
+
+    Args:
+        formula: The formula text from the reply.
+        vocabulary: Lowercased name -> session variable name.
+    """
+    for symbol, replacement in SYMBOLS.items():
+        formula = formula.replace(symbol, replacement)
+    formula = re.sub(r'[A-Za-z_][A-Za-z0-9_]*',
+                     lambda m: vocabulary.get(m.group().lower(), m.group()), formula)
+    try:
+        compiled = compile_expression(formula)
+    except Exception:
+        return None
+    if not compiled.variables <= set(vocabulary.values()):
+        return None
+    return formula, compiled.variables
+
+
+def extract_conclusion(response, variables=()):
+    """
+    Parses a model reply into an ExtractedConclusion.
+
+    A reply without a formula line is accepted if it is itself a formula over the known
+    variables, which keeps bare formulas such as 'a or not a' checkable.
+
+    Args:
+        response: The raw model reply.
+        variables: The session's variable names; names declared in the reply are added to them.
+
+    Returns:
+        ExtractedConclusion: The parsed conclusion, or None if no usable formula was found.
+    """
+    if not isinstance(response, str):
+        return None
+    vocabulary = {name.lower(): name for name in variables}
+    propositions = {}
+    premise_lines = []
+    text = formula = None
+    section = None
+    for raw_line in response.splitlines():
+        line = clean_line(raw_line)
+        if not line:
+            continue
+        header = HEADER_PATTERN.match(line)
+        if header:
+            section, rest = header.group(1).lower(), header.group(2).strip()
+            if section == 'conclusion' and rest:
+                text = rest
+            elif section == 'formula' and rest:
+                formula = rest
+            continue
+        if section in ('propositions', 'atoms'):
+            definition = DEFINITION_PATTERN.match(line)
+            if definition:
+                name = definition.group(1).lower()
+                if NAME_PATTERN.match(name) and name not in RESERVED_NAMES:
+                    propositions[name] = definition.group(2).strip()
+                    vocabulary.setdefault(name, name)
+        elif section == 'premises':
+            premise_lines.append(line)
+        elif section == 'conclusion' and text is None:
+            text = line
+        elif section == 'formula' and formula is None:
+            formula = line
+
+    if formula is None:
+        bare = clean_line(response.strip())
+        normalized = normalize_formula(bare, vocabulary) if bare and '\n' not in bare else None
+        if normalized is None:
+            return None
+        return ExtractedConclusion(bare, normalized[0], [], {}, set(normalized[1]))
+
+    normalized = normalize_formula(formula, vocabulary)
+    if normalized is None:
+        return None
+    formula, used = normalized
+    used = set(used)
+    premises = []
+    for line in premise_lines:
+        premise = normalize_formula(line, vocabulary)
+        if premise is not None:  # Premises the model left in prose are not used
+            premises.append(premise[0])
+            used |= premise[1]
+    return ExtractedConclusion(text or formula, formula, premises, propositions, used)
@@ -2,12 +2,11 @@
 from nicegui import ui, app
 import openai
 import logging
-import asyncio
-import concurrent.futures
 from memory import create_memory_folders, store_in_stm, DialogEntry
+from memory.jsonlog import NOT_PREMISE_LOG, format_log
 from agi import AGI
-from api import APIManager
-from chatter import GPT4o, GroqModel
+from api import get_api_manager
+from router import build_router
 from fastapi.staticfiles import StaticFiles
 import os
 
@@ -22,7 +21,7 @@ app.mount('/static', StaticFiles(directory='static'), name='static')
 
 class FundamentalAGI:
     def __init__(self):
-        self.api_manager = APIManager()
+        self.api_manager = get_api_manager()
         self.agi = None
         self.initialize_memory()
         self.initialize_agi()
@@ -73,14 +72,13 @@ class FundamentalAGI:
                 ui.label('No API keys in storage')
 
     def initialize_agi(self):
-        openai_key = self.api_manager.get_api_key('openai')
-        groq_key = self.api_manager.get_api_key('groq')
+        openai_keys = self.api_manager.get_api_keys('openai')
+        groq_keys = self.api_manager.get_api_keys('groq')
         
-        if openai_key:
-            chatter = GPT4o(openai_key)
-        elif groq_key:
-            chatter = GroqModel(groq_key)
-        else:
+        # Route between the providers that have keys, spreading load over each provider's keys,
+        # with a local Ollama server as the last resort
+        chatter = build_router(openai_keys, groq_keys, hedge=True)
+        if chatter is None:
             self.agi = None
             ui.notify("Please add an OpenAI or Groq API key.")
             return
@@ -96,6 +94,14 @@ class FundamentalAGI:
         conclusion = self.agi.reasoning.draw_conclusion()
         return conclusion
 
+    async def get_conclusion_from_agi_async(self, prompt, on_partial=None):
+        # Native async path: chatter calls run on the event loop over the shared connection pool
+        if self.agi is None:
+            ui.notify("Please initialize AGI with an API key first.")
+            return "AGI not initialized."
+        self.agi.reasoning.add_premise(prompt)
+        return await self.agi.reasoning.draw_conclusion_async(on_partial=on_partial)
+
     def perceive_environment(self, agi_prompt):
         return agi_prompt
 
@@ -104,6 +110,8 @@ class FundamentalAGI:
         return conclusion
 
     def read_log_file(self, file_path):
+        if file_path.endswith('.jsonl'):
+            return format_log(file_path)  # Most recent entries of an append-only log
         if os.path.exists(file_path):
             with open(file_path, 'r') as file:
                 return file.read()
@@ -114,19 +122,18 @@ fundamental_agi = FundamentalAGI()
 
 @ui.page('/')
 def main():
-    executor = concurrent.futures.ThreadPoolExecutor()
-
     async def send() -> None:
         question = text.value
         text.value = ''
         with message_container:
             ui.chat_message(text=question, name='query', sent=True)
             response_message = ui.chat_message(name='funAGI', sent=False)
+            with response_message:
+                streamed = ui.html('')  # The conclusion as it streams in
             spinner = ui.spinner(type='dots')
 
         try:
-            loop = asyncio.get_event_loop()
-            conclusion = await loop.run_in_executor(executor, fundamental_agi.get_conclusion_from_agi, question)
+            conclusion = await fundamental_agi.get_conclusion_from_agi_async(question, on_partial=streamed.set_content)
             response_message.clear()
             with response_message:
                 ui.html(conclusion)
@@ -155,8 +162,8 @@ def main():
         dark_mode_toggle = ui.button('Dark Mode', on_click=toggle_dark_mode)
         # Adding log file buttons
         log_files = {
-            "Premises Log": "./memory/logs/premises.json",
-            "Not Premise Log": "./memory/logs/notpremise.json",
+            "Premises Log": "./memory/logs/premises.jsonl",
+            "Not Premise Log": NOT_PREMISE_LOG,
             "Conclusions Log": "./memory/logs/conclusions.txt",
             "Truth Tables Log": "./memory/logs/truth_tables.json",
             "Decisions Log": "./memory/logs/decisions.json"
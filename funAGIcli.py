@@ -2,12 +2,12 @@ import openai
 import logging
 from memory.memory import create_memory_folders, store_in_stm, DialogEntry
 from agi import AGI
-from api import APIManager
-from chatter import GPT4o, GroqModel
+from api import get_api_manager
+from router import build_router
 
 class FundamentalAGI:
     def __init__(self):
-        self.api_manager = APIManager()
+        self.api_manager = get_api_manager()
         self.manage_api_keys()
         self.agi = self.initialize_agi()
         self.initialize_memory()
@@ -31,14 +31,13 @@ class FundamentalAGI:
                 self.api_manager.list_api_keys()
 
     def initialize_agi(self):
-        openai_key = self.api_manager.get_api_key('openai')
-        groq_key = self.api_manager.get_api_key('groq')
+        openai_keys = self.api_manager.get_api_keys('openai')
+        groq_keys = self.api_manager.get_api_keys('groq')
         
-        if openai_key:
-            chatter = GPT4o(openai_key)
-        elif groq_key:
-            chatter = GroqModel(groq_key)
-        else:
+        # Route between the providers that have keys, spreading load over each provider's keys,
+        # with a local Ollama server as the last resort
+        chatter = build_router(openai_keys, groq_keys, hedge=True)
+        if chatter is None:
             print("No suitable API key found. Please add an API key.")
             self.manage_api_keys()
             return self.initialize_agi()
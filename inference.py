@@ -0,0 +1,212 @@
+import time
+from collections import Counter, defaultdict, deque
+
+# Forward-chaining inference for LogicTables and SocraticReasoning.
+#
+# Facts are tuples (relation, *arguments). Rules are Horn clauses whose conditions and
+# conclusion are patterns of the same shape, where terms beginning with '?' are variables.
+# Matching follows the Rete layout: every condition has an alpha memory of the facts that
+# satisfy it on its own, and every rule keeps beta memories of the partial matches for its
+# first k conditions. A new fact is tested only against the conditions indexed under its
+# relation and joined with the stored partial matches, so nothing already matched is
+# re-evaluated, and the engine runs until no new facts are derived.
+
+
+def is_variable(term):
+    return isinstance(term, str) and term.startswith('?')
+
+
+def fact_from_dict(fact):
+    """
+    Converts a LogicTables fact dict {'type': 'fact', 'relation': ..., 'arguments': [...]}
+    into a fact tuple.
+    """
+    relation = fact['relation']
+    if isinstance(relation, (list, tuple)):
+        relation = relation[0] if len(relation) == 1 else tuple(relation)
+    return (relation, *fact.get('arguments', []))
+
+
+def fact_to_dict(fact):
+    return {'type': 'fact', 'relation': fact[0], 'arguments': list(fact[1:])}
+
+
+def match(pattern, fact, bindings):
+    """
+    Matches a pattern against a fact under existing bindings.
+
+    Returns:
+        dict: The extended bindings, or None if the fact does not match.
+    """
+    if len(pattern) != len(fact) or pattern[0] != fact[0]:
+        return None
+    extended = None
+    for term, value in zip(pattern[1:], fact[1:]):
+        if is_variable(term):
+            bound = (extended or bindings).get(term, value)
+            if bound != value:
+                return None
+            if term not in bindings and (extended is None or term not in extended):
+                extended = extended or dict(bindings)
+                extended[term] = value
+        elif term != value:
+            return None
+    return extended if extended is not None else bindings
+
+
+def substitute(pattern, bindings):
+    return tuple(bindings.get(term, term) if is_variable(term) else term for term in pattern)
+
+
+class Rule:
+    """
+    Horn rule: when every condition matches, the conclusion is asserted.
+
+    Args:
+        conditions: A list of patterns, e.g. [('human', '?x')].
+        conclusion: A pattern whose variables all appear in the conditions, e.g. ('mortal', '?x').
+        name: A label used in the firing counts.
+    """
+    def __init__(self, conditions, conclusion, name=None):
+        self.conditions = [tuple(condition) for condition in conditions]
+        self.conclusion = tuple(conclusion)
+        self.name = name or f"{' & '.join(map(str, self.conditions))} -> {self.conclusion}"
+        bound = {term for condition in self.conditions for term in condition[1:] if is_variable(term)}
+        unbound = [term for term in self.conclusion[1:] if is_variable(term) and term not in bound]
+        if not self.conditions:
+            raise ValueError(f"Rule '{self.name}' has no conditions")
+        if unbound:
+            raise ValueError(f"Rule '{self.name}' concludes unbound variables {unbound}")
+
+    def __repr__(self):
+        return f"Rule({self.name!r})"
+
+
+class ForwardChainer:
+    """
+    Incremental forward-chaining engine.
+
+    Args:
+        logic_tables: Optional LogicTables; single-step dict rules are fired through its
+            modus_ponens so existing rule data keeps working.
+    """
+    def __init__(self, logic_tables=None):
+        self.logic_tables = logic_tables
+        self.facts = set()
+        self.alpha = defaultdict(set)  # (relation, arity) -> facts
+        self.rules = []
+        self.rules_by_relation = defaultdict(list)  # relation -> [(rule, condition index)]
+        self.beta = {}  # rule -> [partial matches (bindings) covering conditions[0..k]]
+        self.legacy_rules = defaultdict(list)  # antecedent relation -> [rule dict]
+        self.agenda = deque()
+        self.pending = set()  # Facts currently on the agenda
+        self.derived = []
+        self.stats = {'facts': 0, 'derived': 0, 'activations': 0, 'runs': 0, 'elapsed': 0.0, 'firings': Counter()}
+
+    def add_rule(self, rule):
+        """
+        Adds a Rule, or a LogicTables rule dict {'type': 'rule', 'relation': [p, q, ...]}.
+        Facts already in working memory are matched against it on the next run.
+        """
+        if isinstance(rule, dict):
+            self.legacy_rules[rule['relation'][0]].append(rule)
+            for fact in list(self.facts):
+                if fact[0] == rule['relation'][0]:
+                    self.fire_legacy(rule, fact)
+            return
+        self.rules.append(rule)
+        self.beta[rule] = [[] for _ in rule.conditions]
+        for index, condition in enumerate(rule.conditions):
+            self.rules_by_relation[condition[0]].append((rule, index))
+        # Seed the beta memories from existing working memory, one condition at a time
+        partials = [{}]
+        for index, condition in enumerate(rule.conditions):
+            candidates = self.alpha.get((condition[0], len(condition)), ())
+            partials = [extended for bindings in partials for fact in candidates
+                        for extended in [match(condition, fact, bindings)] if extended is not None]
+            self.beta[rule][index].extend(partials)
+        for bindings in partials:
+            self.fire(rule, bindings)
+
+    def add_fact(self, fact):
+        """
+        Queues a fact tuple or LogicTables fact dict for the next run.
+        """
+        if isinstance(fact, dict):
+            fact = fact_from_dict(fact)
+        fact = tuple(fact)
+        if fact not in self.pending:
+            self.pending.add(fact)
+            self.agenda.append(fact)
+
+    def run(self):
+        """
+        Propagates queued facts until a fixpoint is reached.
+
+        Returns:
+            list: The facts derived during this run.
+        """
+        start = time.perf_counter()
+        derived_before = len(self.derived)
+        while self.agenda:
+            fact = self.agenda.popleft()
+            self.pending.discard(fact)
+            if fact in self.facts:
+                continue
+            self.facts.add(fact)
+            self.alpha[(fact[0], len(fact))].add(fact)
+            self.stats['facts'] += 1
+            for rule, index in self.rules_by_relation.get(fact[0], ()):
+                self.activate(rule, index, fact)
+            for rule in self.legacy_rules.get(fact[0], ()):
+                self.fire_legacy(rule, fact)
+        self.stats['runs'] += 1
+        self.stats['elapsed'] += time.perf_counter() - start
+        return self.derived[derived_before:]
+
+    def activate(self, rule, index, fact):
+        condition = rule.conditions[index]
+        if len(condition) != len(fact):
+            return
+        self.stats['activations'] += 1
+        memories = self.beta[rule]
+        parents = memories[index - 1] if index > 0 else [{}]
+        partials = [extended for bindings in parents for extended in [match(condition, fact, bindings)] if extended is not None]
+        # Join the new partial matches forward through the remaining conditions. The new fact is
+        # left out of these joins; its own activation at each later condition covers it, so no
+        # combination is produced twice.
+        while partials:
+            memories[index].extend(partials)
+            if index == len(rule.conditions) - 1:
+                for bindings in partials:
+                    self.fire(rule, bindings)
+                return
+            index += 1
+            condition = rule.conditions[index]
+            candidates = [candidate for candidate in self.alpha.get((condition[0], len(condition)), ()) if candidate != fact]
+            partials = [extended for bindings in partials for candidate in candidates
+                        for extended in [match(condition, candidate, bindings)] if extended is not None]
+
+    def fire(self, rule, bindings):
+        conclusion = substitute(rule.conclusion, bindings)
+        self.stats['firings'][rule.name] += 1
+        self.assert_derived(conclusion)
+
+    def fire_legacy(self, rule, fact):
+        if self.logic_tables is None:
+            return
+        conclusion = self.logic_tables.modus_ponens(fact_to_dict(fact), rule)
+        if conclusion is not None:
+            self.stats['firings'][str(rule['relation'])] += 1
+            self.assert_derived(fact_from_dict(conclusion))
+
+    def assert_derived(self, fact):
+        if fact in self.facts or fact in self.pending:
+            return
+        self.derived.append(fact)
+        self.stats['derived'] += 1
+        self.pending.add(fact)
+        self.agenda.append(fact)
+
+    def query(self, relation):
+        return sorted(fact for fact in self.facts if fact[0] == relation)
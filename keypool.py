@@ -0,0 +1,258 @@
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from collections import Counter
+from chatter import RateLimitExceeded, RequestRejected, get_chatter
+from ratelimit import get_limiter
+
+# Spreading requests across several API keys of one provider.
+#
+# Each key has its own chatter and, through its key_id, its own rate limiter, so the pool's
+# throughput is the sum of the keys' quotas. A request goes to the next key in turn
+# ('round_robin') or to the key with the fewest requests in flight and the most quota left
+# ('least_loaded'). The member chatters do not retry 429s themselves: a throttled key is
+# benched for its Retry-After, or cooldown seconds without one, and the request moves on to
+# another key at once. A key rejected as invalid or out of quota (401, 403, or a 429 with
+# insufficient_quota) is benched for invalid_cooldown seconds. Once every key has been tried
+# the last error is raised; while every remaining key is benched the request waits for the
+# first one to come back, unless that would pass the budget's deadline.
+
+STRATEGIES = ('round_robin', 'least_loaded')
+
+
+class PooledKey:
+    def __init__(self, chatter, index):
+        self.chatter = chatter
+        self.index = index
+        self.key_id = chatter.key_id
+        self.in_flight = 0
+        self.benched_until = 0.0
+        self.counts = Counter()  # requests, errors, benched
+
+    @property
+    def limiter(self):
+        # Looked up on every use, since configure_limiter replaces the key's limiter
+        return get_limiter(self.chatter.provider, self.key_id)
+
+    def summary(self, now):
+        return {'key': self.key_id, 'in_flight': self.in_flight, 'requests': self.counts['requests'],
+                'errors': self.counts['errors'], 'benched': self.counts['benched'],
+                'benched_for': round(max(0.0, self.benched_until - now), 3), 'headroom': round(self.limiter.headroom(), 3)}
+
+
+class KeyPoolChatter:
+    """
+    A chatter that spreads requests across the API keys of one provider.
+
+    Args:
+        chatters: One chatter per key, all of the same class, e.g. from build_key_pool.
+        strategy: 'round_robin' or 'least_loaded'.
+        cooldown: Seconds a throttled key is benched when the 429 has no Retry-After.
+        invalid_cooldown: Seconds a key rejected as invalid or out of quota is benched.
+    """
+    def __init__(self, chatters, strategy='least_loaded', cooldown=60.0, invalid_cooldown=3600.0):
+        if not chatters:
+            raise ValueError("KeyPoolChatter needs at least one chatter")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy!r}; expected one of {STRATEGIES}")
+        self.keys = [PooledKey(chatter, index) for index, chatter in enumerate(chatters)]
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self.invalid_cooldown = invalid_cooldown
+        self.next_index = 0
+        self.lock = threading.Lock()
+        self.stats = Counter()  # requests, rotations, waits, exhausted
+
+    @property
+    def backend(self):
+        return type(self.keys[0].chatter).__name__
+
+    @property
+    def default_model(self):
+        parameter = inspect.signature(self.keys[0].chatter.generate_response).parameters.get('model')
+        return None if parameter is None or parameter.default is inspect.Parameter.empty else parameter.default
+
+    def key_stats(self):
+        now = time.monotonic()
+        return [key.summary(now) for key in self.keys]
+
+    def select(self, tried):
+        """
+        Claims the key for the next attempt, or returns None when every untried key is benched.
+        """
+        now = time.monotonic()
+        with self.lock:
+            candidates = [key for key in self.keys if key not in tried and key.benched_until <= now]
+            if not candidates:
+                return None
+            if self.strategy == 'round_robin':
+                key = min(candidates, key=lambda key: (key.index - self.next_index) % len(self.keys))
+                self.next_index = (key.index + 1) % len(self.keys)
+            else:
+                key = min(candidates, key=lambda key: (key.in_flight, -key.limiter.headroom(), key.index))
+            key.in_flight += 1
+            key.counts['requests'] += 1
+            return key
+
+    def release(self, key):
+        with self.lock:
+            key.in_flight -= 1
+
+    def bench_for(self, error):
+        # Seconds to bench a key after error, or None if the error is not about the key
+        if isinstance(error, RateLimitExceeded):
+            return error.retry_after or self.cooldown
+        if isinstance(error, RequestRejected) and error.status in (401, 403, 429):
+            return self.invalid_cooldown
+        return None
+
+    def failed(self, key, error):
+        """
+        Benches the key if error is about it and returns True to try another key; otherwise
+        returns False and the error is raised.
+        """
+        seconds = self.bench_for(error)
+        with self.lock:
+            key.counts['errors'] += 1
+            if seconds is None:
+                return False
+            key.benched_until = max(key.benched_until, time.monotonic() + seconds)
+            key.counts['benched'] += 1
+            self.stats['rotations'] += 1
+        logging.warning(f"key pool: benching {self.backend} key {key.key_id} for {seconds:.1f}s: {error}")
+        return True
+
+    def wait_time(self, tried, budget):
+        """
+        Returns the seconds until an untried key is back from the bench, or None if there is
+        no such key or the wait would pass the budget's deadline.
+        """
+        with self.lock:
+            untried = [key.benched_until for key in self.keys if key not in tried]
+        if not untried:
+            return None
+        wait = max(0.0, min(untried) - time.monotonic())
+        remaining = budget.remaining_time() if budget is not None else None
+        if remaining is not None and wait >= remaining:
+            return None
+        with self.lock:
+            self.stats['waits'] += 1
+        return wait
+
+    def exhausted(self, error):
+        with self.lock:
+            self.stats['exhausted'] += 1
+        if error is None:
+            error = RateLimitExceeded(self.keys[0].chatter.provider,
+                                      f"every {self.backend} key is benched past the deadline")
+        raise error
+
+    def generate_response(self, knowledge, model=None, **options):
+        """
+        Calls the chatter of the selected key, moving to another key if this one is throttled.
+
+        Args:
+            knowledge: The prompt text.
+            model: The model name; defaults to the chatter's default model.
+            **options: Passed to the chatter, e.g. max_tokens and budget.
+        """
+        with self.lock:
+            self.stats['requests'] += 1
+        if model is not None:
+            options['model'] = model
+        tried, error = set(), None
+        while True:
+            key = self.select(tried)
+            if key is None:
+                wait = self.wait_time(tried, options.get('budget'))
+                if wait is None:
+                    self.exhausted(error)
+                time.sleep(wait)
+                continue
+            try:
+                return key.chatter.generate_response(knowledge, **options)
+            except (RateLimitExceeded, RequestRejected) as e:
+                if not self.failed(key, e):
+                    raise
+                tried.add(key)
+                error = e
+            finally:
+                self.release(key)
+
+    async def generate_response_async(self, knowledge, model=None, **options):
+        """
+        Async counterpart of generate_response.
+        """
+        with self.lock:
+            self.stats['requests'] += 1
+        if model is not None:
+            options['model'] = model
+        tried, error = set(), None
+        while True:
+            key = self.select(tried)
+            if key is None:
+                wait = self.wait_time(tried, options.get('budget'))
+                if wait is None:
+                    self.exhausted(error)
+                await asyncio.sleep(wait)
+                continue
+            try:
+                return await key.chatter.generate_response_async(knowledge, **options)
+            except (RateLimitExceeded, RequestRejected) as e:
+                if not self.failed(key, e):
+                    raise
+                tried.add(key)
+                error = e
+            finally:
+                self.release(key)
+
+    async def stream_response_async(self, knowledge, model=None, **options):
+        """
+        Streaming counterpart of generate_response; the request moves to another key only if
+        the key fails before its first chunk.
+        """
+        with self.lock:
+            self.stats['requests'] += 1
+        if model is not None:
+            options['model'] = model
+        tried, error = set(), None
+        while True:
+            key = self.select(tried)
+            if key is None:
+                wait = self.wait_time(tried, options.get('budget'))
+                if wait is None:
+                    self.exhausted(error)
+                await asyncio.sleep(wait)
+                continue
+            started = False
+            try:
+                async for chunk in key.chatter.stream_response_async(knowledge, **options):
+                    started = True
+                    yield chunk
+                return
+            except (RateLimitExceeded, RequestRejected) as e:
+                if started or not self.failed(key, e):
+                    raise
+                tried.add(key)
+                error = e
+            finally:
+                self.release(key)
+
+
+def build_key_pool(chatter_class, api_keys, **pool_options):
+    """
+    Returns a chatter for a list of API keys: the plain chatter for a single key, otherwise a
+    KeyPoolChatter whose member chatters leave 429s to the pool. The chatters come from
+    get_chatter, so pools rebuilt for the same keys share their SDK clients.
+
+    Args:
+        chatter_class: GPT4o or GroqModel.
+        api_keys: The provider's API keys, e.g. from APIManager.get_api_keys.
+        **pool_options: Passed to KeyPoolChatter, e.g. strategy='round_robin'.
+    """
+    if len(api_keys) == 1:
+        return get_chatter(chatter_class, api_keys[0])
+    return KeyPoolChatter([get_chatter(chatter_class, api_key, retry_rate_limits=False)
+                           for api_key in api_keys], **pool_options)
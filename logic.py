@@ -1,40 +1,183 @@
+import copy
 import itertools
-import logging
 import datetime
+import os
 import pathlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from expression import compile_expression
+from logsink import ROW, get_log_sink
+from solver import find_counterexample, find_model
+from memory.journal import get_belief_journal
 from memory.memory import create_memory_folders, save_valid_truth, store_in_stm, DialogEntry
 
-class LogicTables:
+class BitTruthTable:
+    """
+    Columnar truth table. Each column is an int used as a packed bit vector where bit i holds
+    the value of row i, with rows in the same order as itertools.product([True, False], ...).
+    """
+    def __init__(self, variables, expressions, columns, size):
+        self.variables = list(variables)
+        self.expressions = list(expressions)
+        self.columns = columns
+        self.size = size
+        self.mask = (1 << size) - 1
+
+    def __len__(self):
+        return self.size
+
+    def column(self, name):
+        bits = bin(self.columns[name])[2:].zfill(self.size)
+        return [bit == '1' for bit in reversed(bits)]
+
+    def count_true(self, name):
+        return bin(self.columns[name]).count('1')
+
+    def is_valid(self, name):
+        return self.columns[name] == self.mask
+
+    def first_false(self, name):
+        falses = self.mask ^ self.columns[name]
+        if not falses:
+            return None
+        return (falses & -falses).bit_length() - 1
+
+    def row(self, index):
+        return {name: bool(packed >> index & 1) for name, packed in self.columns.items()}
+
+    def to_rows(self):
+        return [self.row(i) for i in range(self.size)]
+
+    @staticmethod
+    def variable_columns(variables):
+        n = len(variables)
+        size = 1 << n
+        columns = {}
+        for i, var in enumerate(variables):
+            half = 1 << (n - 1 - i)
+            # True for the first half of every period; double the block until it fills the table
+            packed = (1 << half) - 1
+            width = half << 1
+            while width < size:
+                packed |= packed << width
+                width <<= 1
+            columns[var] = packed
+        return columns, (1 << size) - 1
+
+
+def row_assignment(variables, index):
+    # Assignment for row `index` of the itertools.product([True, False], ...) ordering
+    n = len(variables)
+    return {var: not (index >> (n - 1 - i) & 1) for i, var in enumerate(variables)}
+
+
+def evaluate_partition(variables, expressions, chunk, chunk_bits):
+    """
+    Evaluates rows [chunk << chunk_bits, (chunk + 1) << chunk_bits) of the truth table.
+
+    The leading variables are constant across an aligned block of rows, so only the last
+    chunk_bits variables get packed columns and every expression is evaluated bit-parallel.
+    Runs in a worker process of LogicTables.evaluate_partitioned.
+
+    Returns:
+        tuple: (chunk, {expression: (true count, first false row index or None)})
+    """
+    n = len(variables)
+    fixed = variables[:n - chunk_bits]
+    columns, mask = BitTruthTable.variable_columns(variables[n - chunk_bits:])
+    for i, var in enumerate(fixed):
+        columns[var] = 0 if chunk >> (len(fixed) - 1 - i) & 1 else mask
+    results = {}
+    for expr in expressions:
+        try:
+            packed = compile_expression(expr).evaluate_bits(columns, mask)
+        except Exception:
+            packed = 0
+        falses = mask ^ packed
+        first_false = None
+        if falses:
+            first_false = (chunk << chunk_bits) + (falses & -falses).bit_length() - 1
+        results[expr] = (bin(packed).count('1'), first_false)
+    return chunk, results
+
+
+class TruthTableCache:
+    """
+    Packed truth table maintained incrementally by LogicTables.
+
+    Internal row index bit i belongs to the i-th variable added (bit clear means True), so
+    adding a variable only doubles every existing column with a shift and adding an expression
+    only evaluates its own column. row_index() maps itertools.product row order onto this layout.
+    """
     def __init__(self):
         self.variables = []
-        self.expressions = []
-        self.valid_truths = []
-        self.logger = logging.getLogger('LogicTables')
-        self.logger.setLevel(logging.DEBUG)  # Set to DEBUG to capture all logs
-
-        # Ensure directories exist
-        general_log_dir = './mindx/errors'
-        memory_log_dir = './memory/truth'
-        pathlib.Path(general_log_dir).mkdir(parents=True, exist_ok=True)
-        pathlib.Path(memory_log_dir).mkdir(parents=True, exist_ok=True)
+        self.columns = {}  # Variable name -> packed column
+        self.expression_columns = {}  # Expression string -> packed column
+        self.expression_variables = {}  # Expression string -> variables it reads, None if it failed
+        self.size = 1
+        self.mask = 1
 
-        # General log file for mindx
-        file_handler_mindx = logging.FileHandler(f'{general_log_dir}/log.txt')
-        file_handler_mindx.setLevel(logging.DEBUG)
-        file_formatter_mindx = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        file_handler_mindx.setFormatter(file_formatter_mindx)
-
-        # Log file for memory/truth
-        file_handler_memory = logging.FileHandler(f'{memory_log_dir}/logs.txt')
-        file_handler_memory.setLevel(logging.DEBUG)
-        file_formatter_memory = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        file_handler_memory.setFormatter(file_formatter_memory)
+    def add_variable(self, var):
+        size = self.size
+        for name, packed in self.columns.items():
+            self.columns[name] = packed | (packed << size)
+        for expr, variables in list(self.expression_variables.items()):
+            if variables is None or var in variables:
+                # The column was computed without this variable; let it be re-evaluated
+                del self.expression_columns[expr]
+                del self.expression_variables[expr]
+            else:
+                packed = self.expression_columns[expr]
+                self.expression_columns[expr] = packed | (packed << size)
+        self.columns[var] = self.mask
+        self.variables.append(var)
+        self.size = size << 1
+        self.mask = (1 << self.size) - 1
+
+    def evaluate(self, compiled):
+        return compiled.evaluate_bits(self.columns, self.mask)
+
+    def add_expression(self, expr, packed, variables):
+        self.expression_columns[expr] = packed
+        self.expression_variables[expr] = variables
+
+    def assignment(self, index):
+        return {var: not (index >> i & 1) for i, var in enumerate(self.variables)}
+
+    def first_false(self, packed):
+        falses = self.mask ^ packed
+        if not falses:
+            return None
+        return (falses & -falses).bit_length() - 1
+
+    def first_true(self, packed):
+        if not packed:
+            return None
+        return (packed & -packed).bit_length() - 1
+
+    def row_index(self, product_index):
+        n = len(self.variables)
+        index = 0
+        for i in range(n):
+            if product_index >> (n - 1 - i) & 1:
+                index |= 1 << i
+        return index
 
-        self.logger.addHandler(file_handler_mindx)
-        self.logger.addHandler(file_handler_memory)
 
-        # Remove any other handlers (like StreamHandler) if they exist
-        self.logger.propagate = False
+class LogicTables:
+    def __init__(self, row_log_level=ROW):
+        self.variables = []
+        self.expressions = []
+        self.valid_truths = []
+        self.compiled_expressions = {}  # Expression string -> CompiledExpression, parsed once
+        self.enumeration_limit = 16  # Above this many variables validity is decided by the SAT solver
+        self.truth_table_cache = TruthTableCache()
+        self.parallel_workers = 0  # Above enumeration_limit, > 0 checks validity across this many processes instead of SAT
+        self.belief_journal = get_belief_journal()
+        self.staged_beliefs = None  # Beliefs of a fork, kept out of the journal
+        self.row_log_level = row_log_level  # Per-row evaluation messages are logged at this level
+        # Logs go through the shared queue-backed sink to ./mindx/errors/log.txt and ./memory/truth/logs.txt
+        self.logger = get_log_sink().attach('LogicTables', ['./mindx/errors/log.txt', './memory/truth/logs.txt'])
+        pathlib.Path('./memory/truth').mkdir(parents=True, exist_ok=True)
 
     def log(self, message, level='info'):
         if level == 'info':
@@ -43,26 +186,8 @@ class LogicTables:
             self.logger.error(message)
         elif level == 'warning':
             self.logger.warning(message)
-        self.store_log_in_mindx(message, level)
-        self.store_log_in_memory(message, level)
-
-    def store_log_in_mindx(self, message, level):
-        general_log_path = './mindx/errors/log.txt'
-
-        # Ensure the directory exists
-        pathlib.Path(general_log_path).parent.mkdir(parents=True, exist_ok=True)
-
-        with open(general_log_path, 'a') as file:
-            file.write(f"{level.upper()}: {message}\n")
-
-    def store_log_in_memory(self, message, level):
-        memory_log_path = './memory/truth/logs.txt'
-
-        # Ensure the directory exists
-        pathlib.Path(memory_log_path).parent.mkdir(parents=True, exist_ok=True)
-
-        with open(memory_log_path, 'a') as file:
-            file.write(f"{level.upper()}: {message}\n")
+        elif level == 'row':
+            self.logger.log(self.row_log_level, message)
 
     def add_variable(self, var):
         if var not in self.variables:
@@ -75,73 +200,133 @@ class LogicTables:
     def add_expression(self, expr):
         if expr not in self.expressions:
             self.expressions.append(expr)
+            try:
+                self.compile_expression(expr)
+            except Exception as e:
+                self.log(f"Error compiling expression '{expr}': {e}", level='error')
             self.log(f"Added expression: {expr}")
             self.output_belief(f"Added expression: {expr}")
         else:
             self.log(f"Expression {expr} already exists.", level='warning')
 
     def output_belief(self, belief):
-        belief_path = './memory/truth'
-
-        # Ensure the directory exists
-        pathlib.Path(belief_path).mkdir(parents=True, exist_ok=True)
-
-        belief_file = f"{belief_path}/{datetime.datetime.now().isoformat()}_belief.txt"
-        with open(belief_file, 'w') as file:
-            file.write(belief)
+        if self.staged_beliefs is not None:
+            self.staged_beliefs.append(belief)
+            return
+        # Append to the shared belief journal in ./memory/truth/journal
+        self.belief_journal.append(belief)
+
+    def fork(self):
+        """
+        Returns a copy for speculative work. It has its own variables, expressions, truths and
+        truth table, shares the compiled expressions, and keeps its beliefs in staged_beliefs
+        instead of journaling them.
+        """
+        fork = copy.copy(self)
+        fork.variables = list(self.variables)
+        fork.expressions = list(self.expressions)
+        fork.valid_truths = list(self.valid_truths)
+        fork.truth_table_cache = TruthTableCache()
+        fork.staged_beliefs = []
+        return fork
+
+    def compile_expression(self, expr):
+        compiled = self.compiled_expressions.get(expr)
+        if compiled is None:
+            compiled = compile_expression(expr)
+            self.compiled_expressions[expr] = compiled
+        return compiled
 
     def evaluate_expression(self, expr, values):
-        allowed_operators = {
-            'and': lambda x, y: x and y,
-            'or': lambda x, y: x or y,
-            'not': lambda x: not x,
-            'xor': lambda x, y: x ^ y,
-            'nand': lambda x, y: not (x and y),
-            'nor': lambda x, y: not (x or y),
-            'implication': lambda x, y: not x or y
-        }
-
         try:
-            result = eval(expr, {"__builtins__": None}, {**allowed_operators, **values})
-            self.log(f"Evaluated expression '{expr}' with values {values}: {result}")
+            result = self.compile_expression(expr).evaluate(values)
+            if self.logger.isEnabledFor(self.row_log_level):
+                self.log(f"Evaluated expression '{expr}' with values {values}: {result}", level='row')
             return result
         except Exception as e:
             self.log(f"Error evaluating expression '{expr}': {e}", level='error')
             return False
 
-    def generate_truth_table(self):
-        n = len(self.variables)
-        combinations = list(itertools.product([True, False], repeat=n))
-        truth_table = []
+    def generate_truth_table(self, vectorized=False):
+        if vectorized:
+            return self.generate_bit_table()
 
-        for combo in combinations:
-            values = {self.variables[i]: combo[i] for i in range(n)}
-            result = values.copy()
-            for expr in self.expressions:
-                result[expr] = self.evaluate_expression(expr, values)
-            truth_table.append(result)
+        truth_table = list(self.iter_truth_table())
 
         self.log(f"Generated truth table with {len(truth_table)} rows")
         self.output_belief(f"Generated truth table with {len(truth_table)} rows")
         return truth_table
 
+    def iter_assignments(self):
+        # Lazily yields one assignment of self.variables at a time, in truth table row order
+        for combo in itertools.product([True, False], repeat=len(self.variables)):
+            yield dict(zip(self.variables, combo))
+
+    def iter_truth_table(self):
+        for values in self.iter_assignments():
+            row = values.copy()
+            for expr in self.expressions:
+                row[expr] = self.evaluate_expression(expr, values)
+            yield row
+
+    def generate_bit_table(self):
+        columns, mask = BitTruthTable.variable_columns(self.variables)
+        size = 1 << len(self.variables)
+        table = BitTruthTable(self.variables, self.expressions, columns, size)
+        for expr in self.expressions:
+            try:
+                columns[expr] = self.compile_expression(expr).evaluate_bits(columns, mask)
+            except Exception as e:
+                self.log(f"Error evaluating expression '{expr}': {e}", level='error')
+                columns[expr] = 0
+
+        self.log(f"Generated bit-parallel truth table with {size} rows")
+        self.output_belief(f"Generated truth table with {size} rows")
+        return table
+
+    def cached_table(self):
+        cache = self.truth_table_cache
+        if self.variables[:len(cache.variables)] != cache.variables:
+            # Variables were replaced rather than appended; start over
+            cache = self.truth_table_cache = TruthTableCache()
+        for var in self.variables[len(cache.variables):]:
+            cache.add_variable(var)
+        for expr in self.expressions:
+            if expr not in cache.expression_columns:
+                try:
+                    compiled = self.compile_expression(expr)
+                    cache.add_expression(expr, cache.evaluate(compiled), compiled.variables)
+                except Exception as e:
+                    self.log(f"Error evaluating expression '{expr}': {e}", level='error')
+                    cache.add_expression(expr, 0, None)
+        return cache
+
+    def cached_column(self, expression, compiled):
+        cache = self.cached_table()
+        packed = cache.expression_columns.get(expression)
+        if packed is None:
+            packed = cache.evaluate(compiled)
+        return cache, packed
+
     def display_truth_table(self):
-        truth_table = self.generate_truth_table()
+        cache = self.cached_table()
         headers = self.variables + self.expressions
+        columns = {**cache.columns, **cache.expression_columns}
+        bits = {name: bin(columns[name])[2:].zfill(cache.size)[::-1] for name in headers}
         print("\t".join(headers))
-        for row in truth_table:
-            print("\t".join(str(row[var]) for var in headers))
+        for product_index in range(cache.size):
+            index = cache.row_index(product_index)
+            print("\t".join(str(bits[name][index] == '1') for name in headers))
 
     def validate_truth(self, expression):
         if expression not in self.expressions:
             self.log(f"Expression '{expression}' is not in the list of expressions.", level='warning')
             return False
 
-        truth_table = self.generate_truth_table()
-        for row in truth_table:
-            if not row[expression]:
-                self.log(f"Expression '{expression}' is not valid.")
-                return False
+        valid, counterexample = self.check_validity(expression)
+        if not valid:
+            self.log(f"Expression '{expression}' is not valid. Counterexample: {counterexample}")
+            return False
 
         self.log(f"Expression '{expression}' is valid.")
         self.save_valid_truth(expression)
@@ -159,14 +344,148 @@ class LogicTables:
         return self.valid_truths
 
     def tautology(self, expression):
-        truth_table = self.generate_truth_table()
-        for row in truth_table:
-            if not self.evaluate_expression(expression, row):
-                self.log(f"Expression '{expression}' is not a tautology.", level='info')
-                return False
+        valid, counterexample = self.check_validity(expression)
+        if not valid:
+            self.log(f"Expression '{expression}' is not a tautology. Counterexample: {counterexample}", level='info')
+            return False
         self.log(f"Expression '{expression}' is a tautology.", level='info')
         return True
 
+    def check_validity(self, expression):
+        """
+        Decides whether an expression is true under every assignment of self.variables.
+
+        Up to enumeration_limit variables the expression's column is read from the cached packed
+        table, so repeated checks against an unchanged belief set cost one comparison. Larger
+        variable sets are handed to the SAT solver, which searches for a model of the negated
+        expression instead of visiting all 2^n rows.
+
+        Returns:
+            tuple: (valid, counterexample) where counterexample is a falsifying assignment
+            of self.variables, or None when the expression is valid or cannot be evaluated.
+        """
+        compiled = self.compile_for_check(expression)
+        if compiled is None:
+            return False, None
+
+        if len(self.variables) <= self.enumeration_limit:
+            cache, packed = self.cached_column(expression, compiled)
+            index = cache.first_false(packed)
+            if index is None:
+                return True, None
+            return False, cache.assignment(index)
+
+        if self.parallel_workers:
+            return self.check_validity_parallel(expression)
+
+        counterexample = find_counterexample(compiled.tree)
+        if counterexample is None:
+            return True, None
+        return False, {var: counterexample.get(var, True) for var in self.variables}
+
+    def check_validity_parallel(self, expression, workers=None):
+        """
+        Decides validity by enumerating the truth table across worker processes, cancelling
+        the outstanding partitions as soon as one of them finds a falsifying row.
+
+        Returns:
+            tuple: (valid, counterexample) as for check_validity.
+        """
+        if self.compile_for_check(expression) is None:
+            return False, None
+        result = self.evaluate_partitioned([expression], workers=workers, stop_on_false=True)
+        counterexample = result['counterexamples'][expression]
+        return counterexample is None, counterexample
+
+    def evaluate_partitioned(self, expressions=None, workers=None, stop_on_false=False):
+        """
+        Evaluates expressions over every assignment of self.variables in a ProcessPoolExecutor.
+
+        The assignment space is split into contiguous, aligned ranges of rows, several per
+        worker so that stopping early can skip most of the table.
+
+        Args:
+            expressions: The expressions to evaluate; defaults to self.expressions.
+            workers: The number of processes; defaults to parallel_workers or the CPU count.
+            stop_on_false: Cancel the remaining ranges once any expression has a false row.
+
+        Returns:
+            dict: 'rows' in the table, 'counts' of true rows per expression, 'counterexamples'
+            with the lowest falsifying assignment found per expression (or None), and
+            'complete', which is False when ranges were cancelled and the counts are partial.
+        """
+        expressions = list(self.expressions if expressions is None else expressions)
+        variables = list(self.variables)
+        n = len(variables)
+        workers = workers or self.parallel_workers or os.cpu_count() or 1
+        # At least four ranges per worker, and no more than 2^20 rows held by a worker at once
+        chunk_bits = max(0, min(20, n - (workers * 4 - 1).bit_length()))
+        counts = {expr: 0 for expr in expressions}
+        first_false = {expr: None for expr in expressions}
+        complete = True
+
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = [executor.submit(evaluate_partition, variables, expressions, chunk, chunk_bits)
+                       for chunk in range(1 << (n - chunk_bits))]
+            for future in as_completed(futures):
+                _, results = future.result()
+                for expr, (count, index) in results.items():
+                    counts[expr] += count
+                    if index is not None and (first_false[expr] is None or index < first_false[expr]):
+                        first_false[expr] = index
+                if stop_on_false and any(index is not None for index in first_false.values()):
+                    complete = not any([f.cancel() for f in futures]) and all(f.done() for f in futures)
+                    break
+        finally:
+            executor.shutdown(wait=complete, cancel_futures=True)
+
+        self.log(f"Evaluated {len(expressions)} expressions over {1 << n} rows with {workers} processes"
+                 f"{'' if complete else ' (stopped at first counterexample)'}")
+        return {
+            'rows': 1 << n,
+            'counts': counts,
+            'counterexamples': {expr: None if index is None else row_assignment(variables, index)
+                                for expr, index in first_false.items()},
+            'complete': complete
+        }
+
+    def check_satisfiability(self, expression):
+        """
+        Decides whether some assignment of self.variables makes an expression true.
+
+        Returns:
+            tuple: (satisfiable, model) where model is a satisfying assignment of
+            self.variables, or None when there is none.
+        """
+        compiled = self.compile_for_check(expression)
+        if compiled is None:
+            return False, None
+
+        if len(self.variables) <= self.enumeration_limit:
+            cache, packed = self.cached_column(expression, compiled)
+            index = cache.first_true(packed)
+            if index is None:
+                return False, None
+            return True, cache.assignment(index)
+
+        model = find_model(compiled.tree)
+        if model is None:
+            return False, None
+        return True, {var: model.get(var, True) for var in self.variables}
+
+    def compile_for_check(self, expression):
+        try:
+            compiled = self.compile_expression(expression)
+        except Exception as e:
+            self.log(f"Error evaluating expression '{expression}': {e}", level='error')
+            return None
+        unknown = compiled.variables - set(self.variables)
+        if unknown:
+            self.log(f"Expression '{expression}' uses unknown variables: {sorted(unknown)}", level='error')
+            return None
+        return compiled
+
     def modus_ponens(self, fact1, fact2):
         if fact1['type'] == 'fact' and fact2['type'] == 'rule':
             if self.unify_variables(fact1, fact2):
@@ -0,0 +1,182 @@
+import atexit
+import logging
+import logging.handlers
+import pathlib
+import queue
+import threading
+
+# Shared, queue-backed log sink for LogicTables and SocraticReasoning.
+#
+# Loggers only put records on an in-memory queue (QueueHandler). One background thread drains
+# the queue in batches, hands each record to the rotating file handlers that subscribe to its
+# logger, and flushes each file once per batch instead of once per message.
+
+ROW = 5  # Level for per-row truth table messages, below DEBUG so they are dropped by default
+logging.addLevelName(ROW, 'ROW')
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class LoggerNameFilter(logging.Filter):
+    def __init__(self):
+        super().__init__()
+        self.names = set()
+
+    def filter(self, record):
+        return record.name in self.names
+
+
+class BatchRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler that leaves flushing to the sink, which flushes once per batch.
+    """
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+    def close(self):
+        self.flush_batch()
+        super().close()
+
+
+class LogSink:
+    """
+    Queue-based log sink with batched writes and size-based rotation.
+
+    Args:
+        batch_size: The maximum number of records written between flushes.
+        flush_interval: Seconds the writer waits for more records before flushing a partial batch.
+        max_bytes: The size at which a log file is rotated.
+        backup_count: The number of rotated files to keep.
+    """
+    def __init__(self, batch_size=512, flush_interval=0.5, max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = queue.SimpleQueue()
+        self.queue_handler = logging.handlers.QueueHandler(self.queue)
+        self.handlers = {}  # Resolved file path -> BatchRotatingFileHandler
+        self.attached = set()  # (logger name, path as given) already subscribed
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stopping = object()
+
+    def attach(self, name, paths, level=logging.DEBUG):
+        """
+        Routes a logger's records to the given files through the sink.
+
+        Attaching the same logger again is a no-op apart from subscribing any new paths, so
+        creating many LogicTables or SocraticReasoning instances does not duplicate handlers.
+
+        Args:
+            name: The logger name.
+            paths: The files that should receive the logger's records.
+            level: The logger level.
+
+        Returns:
+            logging.Logger: The configured logger.
+        """
+        logger = logging.getLogger(name)
+        subscriptions = {(name, path) for path in paths}
+        if subscriptions <= self.attached and self.queue_handler in logger.handlers and logger.level == level:
+            return logger  # Fast path for repeat attaches; resolving paths dominates object creation
+        logger.setLevel(level)
+        logger.propagate = False
+        with self.lock:
+            for path in paths:
+                self.handler_for(path).filters[0].names.add(name)
+            self.attached |= subscriptions
+            if self.queue_handler not in logger.handlers:
+                logger.addHandler(self.queue_handler)
+            self.start()
+        return logger
+
+    def handler_for(self, path):
+        key = str(pathlib.Path(path).resolve())
+        handler = self.handlers.get(key)
+        if handler is None:
+            pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+            handler = BatchRotatingFileHandler(path, maxBytes=self.max_bytes, backupCount=self.backup_count, delay=True)
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            handler.addFilter(LoggerNameFilter())
+            self.handlers[key] = handler
+        return handler
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run, name='LogSink', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [record]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = self.write(batch)
+            if stop:
+                return
+
+    def write(self, batch):
+        stop = False
+        markers = []
+        with self.lock:
+            handlers = list(self.handlers.values())
+        for record in batch:
+            if record is self.stopping:
+                stop = True
+            elif isinstance(record, threading.Event):
+                markers.append(record)  # flush() marker, released once this batch is on disk
+            else:
+                for handler in handlers:
+                    handler.handle(record)
+        for handler in handlers:
+            try:
+                handler.flush_batch()
+            except Exception:
+                pass
+        for marker in markers:
+            marker.set()
+        return stop
+
+    def flush(self, timeout=5.0):
+        """
+        Blocks until every record queued so far has been written.
+        """
+        if self.thread is None or not self.thread.is_alive():
+            return
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait(timeout)
+
+    def stop(self):
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(self.stopping)
+            self.thread.join()
+        for handler in self.handlers.values():
+            handler.close()
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_log_sink():
+    """
+    Returns the process-wide LogSink, creating it on first use.
+    """
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = LogSink()
+            atexit.register(_sink.stop)
+        return _sink
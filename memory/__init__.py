@@ -1 +1,3 @@
 from .memory import create_memory_folders, store_in_stm, DialogEntry
+from .journal import BeliefJournal, get_belief_journal, migrate_belief_files
+from .premises import PremiseJournal, get_premise_journal
@@ -0,0 +1,251 @@
+import bisect
+import datetime
+import logging
+import os
+import pathlib
+import sys
+import threading
+import ujson
+
+# Append-only belief journal replacing one file per belief in ./memory/truth.
+#
+# Beliefs are appended as JSON lines to numbered segment files. A segment is closed once it
+# reaches max_segment_bytes and the next one is started. index.jsonl records the byte offset
+# of every index_interval-th entry and of the first entry of each segment, so a reader can
+# seek straight to any sequence number without scanning earlier segments.
+
+TRUTH_FOLDER = "./memory/truth/"
+JOURNAL_FOLDER = TRUTH_FOLDER + "journal/"
+
+
+class BeliefJournal:
+    """
+    Segmented append-only JSONL journal of beliefs.
+
+    Args:
+        directory: The folder holding segment files and the offset index.
+        max_segment_bytes: The size at which a new segment is started.
+        index_interval: An index entry is written every index_interval beliefs.
+    """
+    def __init__(self, directory=JOURNAL_FOLDER, max_segment_bytes=8 * 1024 * 1024, index_interval=1000):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_segment_bytes = max_segment_bytes
+        self.index_interval = index_interval
+        self.index_path = self.directory / 'index.jsonl'
+        self.lock = threading.Lock()
+        self.file = None
+        self.index = self.load_index()  # Sorted list of (seq, segment, offset)
+        self.segment, self.segment_size, self.next_seq = self.recover()
+
+    def segment_path(self, segment):
+        return self.directory / f"segment-{segment:06d}.jsonl"
+
+    def segments(self):
+        return sorted(int(path.stem.split('-')[1]) for path in self.directory.glob('segment-*.jsonl'))
+
+    def load_index(self):
+        index = []
+        try:
+            with open(self.index_path, 'rb') as file:
+                for line in file:
+                    try:
+                        entry = ujson.loads(line)
+                    except ValueError:
+                        continue  # torn write at the end of the index
+                    index.append((entry['seq'], entry['segment'], entry['offset']))
+        except FileNotFoundError:
+            pass
+        index.sort()
+        return index
+
+    def recover(self):
+        segments = self.segments()
+        if not segments:
+            return 1, 0, 0
+        segment = segments[-1]
+        path = self.segment_path(segment)
+        size = path.stat().st_size
+        with open(path, 'rb') as file:
+            file.seek(max(0, size - 65536))
+            lines = file.read().split(b'\n')
+        # A trailing partial line comes from an interrupted write and is truncated away
+        if lines[-1]:
+            size -= len(lines[-1])
+            with open(path, 'r+b') as file:
+                file.truncate(size)
+        for line in reversed(lines[:-1]):
+            try:
+                return segment, size, ujson.loads(line)['seq'] + 1
+            except (ValueError, KeyError):
+                continue
+        # Empty last segment: continue numbering from the previous one or the index
+        next_seq = self.index[-1][0] if self.index else 0
+        for entry in self.read(next_seq):
+            next_seq = entry['seq'] + 1
+        return segment, size, next_seq
+
+    def open_segment(self):
+        if self.file is None:
+            self.file = open(self.segment_path(self.segment), 'ab')
+
+    def append(self, belief, timestamp=None, **fields):
+        """
+        Appends a belief to the journal.
+
+        Args:
+            belief: The belief text, or any JSON-serialisable value.
+            timestamp: An ISO timestamp; defaults to now.
+            **fields: Extra JSON-serialisable fields stored with the entry.
+
+        Returns:
+            int: The sequence number of the new entry.
+        """
+        entry = {"timestamp": timestamp or datetime.datetime.now().isoformat(), "belief": belief, **fields}
+        with self.lock:
+            if self.segment_size >= self.max_segment_bytes:
+                self.close()
+                self.segment += 1
+                self.segment_size = 0
+            self.open_segment()
+            seq = self.next_seq
+            data = (ujson.dumps({"seq": seq, **entry}) + "\n").encode('utf-8')
+            if self.segment_size == 0 or seq % self.index_interval == 0:
+                self.index.append((seq, self.segment, self.segment_size))
+                with open(self.index_path, 'ab') as index_file:
+                    index_file.write((ujson.dumps({"seq": seq, "segment": self.segment, "offset": self.segment_size}) + "\n").encode('utf-8'))
+            self.file.write(data)
+            self.file.flush()
+            self.segment_size += len(data)
+            self.next_seq = seq + 1
+            return seq
+
+    def read(self, start=0, limit=None):
+        """
+        Yields journal entries in order, beginning at sequence number start.
+
+        Args:
+            start: The first sequence number to return.
+            limit: The maximum number of entries to return.
+        """
+        position = bisect.bisect_right(self.index, (start, float('inf'), float('inf'))) - 1
+        if position >= 0:
+            _, segment, offset = self.index[position]
+        else:
+            segments = self.segments()
+            if not segments:
+                return
+            segment, offset = segments[0], 0
+
+        count = 0
+        last_segment = self.segments()[-1] if self.segments() else segment
+        while segment <= last_segment:
+            try:
+                with open(self.segment_path(segment), 'rb') as file:
+                    file.seek(offset)
+                    for line in file:
+                        if not line.endswith(b'\n'):
+                            break  # entry still being written
+                        entry = ujson.loads(line)
+                        if entry['seq'] < start:
+                            continue
+                        yield entry
+                        count += 1
+                        if limit is not None and count >= limit:
+                            return
+            except FileNotFoundError:
+                pass
+            segment += 1
+            offset = 0
+
+    def tail(self, n):
+        """
+        Returns the last n entries.
+        """
+        return list(self.read(max(0, self.next_seq - n)))
+
+    def __iter__(self):
+        return self.read()
+
+    def __len__(self):
+        return self.next_seq
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+_journals = {}
+_journal_aliases = {}  # Absolute path as given -> journal
+_journals_lock = threading.Lock()
+
+
+def get_belief_journal(directory=JOURNAL_FOLDER):
+    """
+    Returns the shared BeliefJournal for a directory so every writer in the process uses one
+    sequence counter and one open segment.
+    """
+    alias = os.path.abspath(directory)  # Cheap lookup key; resolve() stats every path component
+    journal = _journal_aliases.get(alias)
+    if journal is not None:
+        return journal
+    key = str(pathlib.Path(directory).resolve())
+    with _journals_lock:
+        journal = _journals.get(key)
+        if journal is None:
+            journal = BeliefJournal(directory)
+            _journals[key] = journal
+        _journal_aliases[alias] = journal
+        return journal
+
+
+def migrate_belief_files(truth_folder=TRUTH_FOLDER, journal=None, remove=False):
+    """
+    Folds the legacy one-file-per-belief output of ./memory/truth into the journal.
+
+    Picks up `<isoformat>_belief.txt` files written by LogicTables.output_belief and
+    `belief_<YYYYmmddHHMMSS>.json` files written by SocraticReasoning.update_logic_tables,
+    appending them in timestamp order with their original timestamps.
+
+    Args:
+        truth_folder: The folder containing the legacy belief files.
+        journal: The journal to append to; defaults to the shared journal.
+        remove: Delete each legacy file once it has been journaled.
+
+    Returns:
+        int: The number of files migrated.
+    """
+    journal = journal or get_belief_journal()
+    folder = pathlib.Path(truth_folder)
+    pending = []
+    for path in folder.glob('*_belief.txt'):
+        timestamp = path.name[:-len('_belief.txt')]
+        pending.append((timestamp, path, 'text'))
+    for path in folder.glob('belief_*.json'):
+        try:
+            timestamp = datetime.datetime.strptime(path.stem[len('belief_'):], '%Y%m%d%H%M%S').isoformat()
+        except ValueError:
+            continue
+        pending.append((timestamp, path, 'json'))
+    pending.sort(key=lambda item: item[0])
+
+    migrated = 0
+    for timestamp, path, kind in pending:
+        try:
+            with open(path, 'r') as file:
+                belief = file.read() if kind == 'text' else ujson.load(file)
+        except (OSError, ValueError) as e:
+            logging.error(f"Skipping belief file {path}: {e}")
+            continue
+        journal.append(belief, timestamp=timestamp, migrated_from=path.name)
+        if remove:
+            path.unlink()
+        migrated += 1
+    return migrated
+
+
+if __name__ == '__main__':
+    # python -m memory.journal [--remove]
+    count = migrate_belief_files(remove='--remove' in sys.argv[1:])
+    print(f"Migrated {count} belief files into {JOURNAL_FOLDER}")
@@ -0,0 +1,204 @@
+import datetime
+import os
+import pathlib
+import threading
+import ujson
+
+# Append-only JSONL logs with size-based rotation for notpremise and thoughts entries.
+#
+# Each entry is one JSON object per line with an ISO "timestamp". When a file would grow past
+# max_bytes it is rotated the way logging.handlers.RotatingFileHandler does it: log.jsonl
+# becomes log.jsonl.1, log.jsonl.1 becomes log.jsonl.2 and so on, keeping backup_count files.
+# Readers walk the files from newest to oldest for tail queries and from oldest to newest for
+# time-range queries, so neither has to load a whole file.
+
+NOT_PREMISE_LOG = "./memory/logs/notpremise.jsonl"
+THOUGHTS_LOG = "./memory/logs/thoughts.jsonl"
+
+
+def as_timestamp(value):
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+class JsonlLog:
+    """
+    Rotating append-only JSONL log.
+
+    Args:
+        path: The current log file.
+        max_bytes: The size at which the file is rotated.
+        backup_count: The number of rotated files kept.
+    """
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.lock = threading.Lock()
+        self.file = None
+
+    def rotated_path(self, index):
+        return self.path if index == 0 else self.path.with_name(f"{self.path.name}.{index}")
+
+    def files(self):
+        """
+        Returns the existing log files from newest to oldest.
+        """
+        return [path for path in map(self.rotated_path, range(self.backup_count + 1)) if path.exists()]
+
+    def append(self, entry):
+        """
+        Appends an entry, stamping it with the current time if it has no timestamp.
+
+        Returns:
+            dict: The entry as written.
+        """
+        entry = {"timestamp": datetime.datetime.now().isoformat(), **entry}
+        data = (ujson.dumps(entry) + "\n").encode('utf-8')
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, 'ab')
+            if self.file.tell() and self.file.tell() + len(data) > self.max_bytes:
+                self.rotate()
+            self.file.write(data)
+            self.file.flush()
+        return entry
+
+    def rotate(self):
+        self.close()
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = self.rotated_path(index)
+                if source.exists():
+                    os.replace(source, self.rotated_path(index + 1))
+            os.replace(self.path, self.rotated_path(1))
+        else:
+            self.path.unlink()
+        self.file = open(self.path, 'ab')
+
+    def tail(self, n):
+        """
+        Returns the last n entries, oldest first.
+        """
+        entries = []
+        for path in self.files():
+            if len(entries) >= n:
+                break
+            entries[:0] = read_last_lines(path, n - len(entries))
+        return entries
+
+    def between(self, start=None, end=None):
+        """
+        Yields the entries whose timestamp lies in [start, end], oldest first.
+
+        Args:
+            start: A datetime or ISO timestamp; None means from the beginning.
+            end: A datetime or ISO timestamp; None means up to now.
+        """
+        start, end = as_timestamp(start), as_timestamp(end)
+        for path in reversed(self.files()):
+            if start is not None:
+                last = read_last_lines(path, 1)
+                if last and last[0].get('timestamp', '') < start:
+                    continue  # Every entry in this file is older than the range
+            for entry in read_lines(path):
+                timestamp = entry.get('timestamp', '')
+                if end is not None and timestamp > end:
+                    return
+                if start is None or timestamp >= start:
+                    yield entry
+
+    def __iter__(self):
+        return self.between()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_lines(path):
+    try:
+        with open(path, 'rb') as file:
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break  # entry still being written
+                try:
+                    yield ujson.loads(line)
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        return
+
+
+def read_last_lines(path, n, block_size=65536):
+    """
+    Returns the last n complete entries of one file by reading blocks from its end.
+    """
+    if n <= 0:
+        return []
+    try:
+        with open(path, 'rb') as file:
+            file.seek(0, os.SEEK_END)
+            position = file.tell()
+            data = b''
+            while position > 0 and data.count(b'\n') <= n:
+                step = min(block_size, position)
+                position -= step
+                file.seek(position)
+                data = file.read(step) + data
+    except FileNotFoundError:
+        return []
+    lines = data.split(b'\n')
+    lines.pop()  # Empty after the final newline, or an entry still being written
+    if position > 0:
+        lines = lines[1:]  # The first line may be cut off by the block boundary
+    entries = []
+    for line in lines[-n:]:
+        try:
+            entries.append(ujson.loads(line))
+        except ValueError:
+            continue
+    return entries
+
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def get_jsonl_log(path):
+    """
+    Returns the shared JsonlLog for a path so every writer in the process rotates one file.
+    """
+    key = str(pathlib.Path(path).resolve())
+    with _logs_lock:
+        log = _logs.get(key)
+        if log is None:
+            log = JsonlLog(path)
+            _logs[key] = log
+        return log
+
+
+def format_log(path, tail=200, start=None, end=None):
+    """
+    Renders the entries of a JSONL log as markdown for the log viewers.
+
+    Args:
+        path: The log file.
+        tail: The number of most recent entries shown when no time range is given.
+        start: The beginning of a time range.
+        end: The end of a time range.
+
+    Returns:
+        str: One JSON entry per line in a code block.
+    """
+    log = get_jsonl_log(path)
+    if start is None and end is None:
+        entries = log.tail(tail)
+    else:
+        entries = list(log.between(start, end))
+    if not entries:
+        return f"Log file {path} has no entries."
+    return "```\n" + "\n".join(ujson.dumps(entry) for entry in entries) + "\n```"
@@ -0,0 +1,211 @@
+import datetime
+import os
+import pathlib
+import threading
+import ujson
+
+# Append-only premise store for SocraticReasoning, replacing premises.json.
+#
+# Every change is appended to premises.jsonl as one event with a single schema:
+#   {"seq": n, "timestamp": iso, "session": str, "event": "add" | "remove" | "clear", "premise": str | null}
+#   {"seq": n, "timestamp": iso, "session": str, "event": "conclusion", "premises": [...], "conclusion": str, "reason": str}
+# Each SocraticReasoning writes under its own session name, so reasoners sharing the file
+# (e.g. one per bdi.Belief) keep separate premise lists; events written before sessions
+# existed belong to DEFAULT_SESSION. A conclusion event also clears its session's premise
+# list. Loading replays the events to rebuild the current premises of every session. Once the
+# log holds compact_after events more than its live premises, it is rewritten as one add event
+# per live premise. Compaction replaces the file, so every writer in the process must share
+# one journal per file through get_premise_journal.
+
+PREMISES_FILE = "./memory/logs/premises.jsonl"
+DEFAULT_SESSION = "default"
+
+
+class PremiseJournal:
+    """
+    Journaled premise lists, one per session.
+
+    Args:
+        path: The JSONL event log.
+        compact_after: The number of superseded events that triggers compaction.
+    """
+    def __init__(self, path=PREMISES_FILE, compact_after=1000):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.compact_after = compact_after
+        self.lock = threading.Lock()
+        self.file = None
+        self.sessions = {}  # session -> current premises
+        self.events = 0  # Events in the log, live or superseded
+        self.next_seq = 0
+        self.load()
+
+    def load(self):
+        """
+        Rebuilds the premise lists by replaying the event log.
+
+        Returns:
+            dict: The current premises of each session.
+        """
+        self.close()
+        sessions = {}
+        events = 0
+        size = 0
+        try:
+            with open(self.path, 'rb') as file:
+                for line in file:
+                    if not line.endswith(b'\n'):
+                        break  # torn write from an interrupted append
+                    try:
+                        entry = ujson.loads(line)
+                    except ValueError:
+                        break
+                    size += len(line)
+                    events += 1
+                    self.next_seq = entry.get('seq', self.next_seq) + 1
+                    self.apply(sessions, entry)
+            if size != self.path.stat().st_size:
+                with open(self.path, 'r+b') as file:
+                    file.truncate(size)
+        except FileNotFoundError:
+            pass
+        self.sessions = sessions
+        self.events = events
+        return {session: list(premises) for session, premises in sessions.items()}
+
+    @staticmethod
+    def apply(sessions, entry):
+        premises = sessions.setdefault(entry.get('session', DEFAULT_SESSION), [])
+        event = entry.get('event')
+        if event == 'add':
+            premises.append(entry['premise'])
+        elif event == 'remove':
+            if entry['premise'] in premises:
+                premises.remove(entry['premise'])
+        elif event in ('clear', 'conclusion'):
+            premises.clear()
+        if not premises:
+            del sessions[entry.get('session', DEFAULT_SESSION)]
+
+    def live_premises(self):
+        return sum(len(premises) for premises in self.sessions.values())
+
+    def premises(self, session=DEFAULT_SESSION):
+        with self.lock:
+            return list(self.sessions.get(session, ()))
+
+    def record(self, event, premise=None, session=DEFAULT_SESSION, **fields):
+        with self.lock:
+            entry = {"seq": self.next_seq, "timestamp": datetime.datetime.now().isoformat(),
+                     "session": session, "event": event, "premise": premise, **fields}
+            if self.file is None:
+                self.file = open(self.path, 'ab')
+            self.file.write((ujson.dumps(entry) + "\n").encode('utf-8'))
+            self.file.flush()
+            self.next_seq += 1
+            self.events += 1
+            self.apply(self.sessions, entry)
+            if self.events - self.live_premises() >= self.compact_after:
+                self.compact_locked()
+        return entry['seq']
+
+    def add(self, premise, session=DEFAULT_SESSION):
+        return self.record('add', premise, session)
+
+    def remove(self, premise, session=DEFAULT_SESSION):
+        return self.record('remove', premise, session)
+
+    def clear(self, session=DEFAULT_SESSION):
+        return self.record('clear', session=session)
+
+    def conclude(self, premises, conclusion, reason=None, session=DEFAULT_SESSION):
+        """
+        Records the premises and conclusion of a finished round and clears the session's premises.
+        """
+        return self.record('conclusion', session=session, premises=list(premises), conclusion=conclusion, reason=reason)
+
+    def session(self, name=DEFAULT_SESSION):
+        """
+        Returns a view of the journal that reads and writes one session's premises.
+        """
+        return PremiseSession(self, name)
+
+    def compact(self):
+        with self.lock:
+            self.compact_locked()
+
+    def compact_locked(self):
+        self.close()
+        timestamp = datetime.datetime.now().isoformat()
+        temporary = self.path.with_suffix('.jsonl.tmp')
+        with open(temporary, 'wb') as file:
+            for session, premises in self.sessions.items():
+                for premise in premises:
+                    entry = {"seq": self.next_seq, "timestamp": timestamp, "session": session,
+                             "event": "add", "premise": premise}
+                    file.write((ujson.dumps(entry) + "\n").encode('utf-8'))
+                    self.next_seq += 1
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+        self.events = self.live_premises()
+
+    def entries(self):
+        """
+        Yields the events currently in the log.
+        """
+        try:
+            with open(self.path, 'rb') as file:
+                for line in file:
+                    if line.endswith(b'\n'):
+                        yield ujson.loads(line)
+        except FileNotFoundError:
+            return
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class PremiseSession:
+    """
+    One session of a PremiseJournal, with the journal's methods bound to the session name.
+    """
+    def __init__(self, journal, name):
+        self.journal = journal
+        self.name = name
+
+    @property
+    def premises(self):
+        return self.journal.premises(self.name)
+
+    def add(self, premise):
+        return self.journal.add(premise, self.name)
+
+    def remove(self, premise):
+        return self.journal.remove(premise, self.name)
+
+    def clear(self):
+        return self.journal.clear(self.name)
+
+    def conclude(self, premises, conclusion, reason=None):
+        return self.journal.conclude(premises, conclusion, reason, self.name)
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_premise_journal(path=PREMISES_FILE):
+    """
+    Returns the shared PremiseJournal for a path so every writer in the process appends through
+    one handle and sees the file that compaction swapped in.
+    """
+    key = str(pathlib.Path(path).resolve())
+    with _journals_lock:
+        journal = _journals.get(key)
+        if journal is None:
+            journal = PremiseJournal(path)
+            _journals[key] = journal
+        return journal
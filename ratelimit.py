@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import threading
+import time
+
+# Client-side rate limiting for the chatter classes.
+#
+# Every provider, or every API key of a provider when a chatter is built for one, has one
+# ProviderLimiter per process, shared by all chatters, sessions and threads that use it. A
+# limiter holds two token buckets, one for requests and one for tokens, each refilled
+# continuously at its per-minute rate. A call reserves one request and
+# its estimated tokens up front; when a bucket is short the reservation still goes through and
+# the caller sleeps until the bucket has refilled, so waiting callers are served in order and
+# nobody polls. Once the response reports its real usage the token estimate is corrected.
+# A 429 from the provider pauses the whole limiter for its Retry-After, so concurrent callers
+# back off together instead of each sending its own doomed request.
+
+# Default limits per provider: (requests per minute, tokens per minute); None is unlimited.
+# The OpenAI figures are tier 1 limits for gpt-4o, the Groq figures free tier limits.
+PROVIDER_LIMITS = {
+    'openai': (500, 30000),
+    'groq': (30, 5000),
+    'ollama': (None, None),
+}
+
+
+class TokenBucket:
+    """
+    A token bucket refilled at rate tokens per second up to capacity.
+
+    Args:
+        rate: Tokens added per second.
+        capacity: The most tokens the bucket holds, i.e. the allowed burst.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount, now):
+        """
+        Takes amount tokens, going into debt if needed, and returns the seconds until the
+        debt is repaid. A request larger than the bucket is capped at its capacity.
+        """
+        self.refill(now)
+        self.tokens -= min(amount, self.capacity)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount, now):
+        self.refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ProviderLimiter:
+    """
+    Request and token limits of one provider.
+
+    Args:
+        requests_per_minute: Requests allowed per minute, or None for no limit.
+        tokens_per_minute: Prompt and completion tokens allowed per minute, or None for no limit.
+    """
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute / 60.0, requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute) if tokens_per_minute else None
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens):
+        # Returns the seconds the caller must wait before sending the request
+        now = time.monotonic()
+        with self.lock:
+            wait = max(0.0, self.paused_until - now)
+            if self.requests is not None:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens is not None and tokens:
+                wait = max(wait, self.tokens.reserve(tokens, now))
+            return wait
+
+    def release(self, tokens):
+        # Gives back a reservation that was not used, e.g. when the budget rules out the wait
+        now = time.monotonic()
+        with self.lock:
+            if self.requests is not None:
+                self.requests.refund(1, now)
+            if self.tokens is not None and tokens:
+                self.tokens.refund(tokens, now)
+
+    def settle(self, estimated, used):
+        """
+        Corrects the token bucket once a response reports the tokens it really used.
+        """
+        if self.tokens is None or used is None:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if used < estimated:
+                self.tokens.refund(estimated - used, now)
+            else:
+                self.tokens.reserve(used - estimated, now)
+
+    def headroom(self):
+        """
+        Returns the fraction of the emptier bucket still available: 1.0 for an idle or
+        unlimited limiter, 0.0 while paused or in debt.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if now < self.paused_until:
+                return 0.0
+            fractions = [1.0]
+            for bucket in (self.requests, self.tokens):
+                if bucket is not None:
+                    bucket.refill(now)
+                    fractions.append(max(0.0, bucket.tokens / bucket.capacity))
+            return min(fractions)
+
+    def pause(self, seconds):
+        """
+        Holds back every caller of this provider for seconds, e.g. the Retry-After of a 429.
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def acquire(self, tokens=0, max_wait=None):
+        """
+        Waits until a request of tokens may be sent.
+
+        Args:
+            tokens: The estimated prompt and completion tokens of the request.
+            max_wait: The longest acceptable wait; if the wait would be longer the reservation
+                is released and False is returned without waiting.
+
+        Returns:
+            bool: True once the request may be sent.
+        """
+        wait = self.reserve(tokens)
+        if max_wait is not None and wait > max_wait:
+            self.release(tokens)
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    async def acquire_async(self, tokens=0, max_wait=None):
+        """
+        Async counterpart of acquire.
+        """
+        wait = self.reserve(tokens)
+        if max_wait is not None and wait > max_wait:
+            self.release(tokens)
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+
+_limiters = {}  # (provider, key id) -> ProviderLimiter
+_limiters_lock = threading.Lock()
+
+
+def key_id(api_key):
+    # A short fingerprint naming an API key in limiters, stats and logs without exposing it
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12] if api_key else None
+
+
+def get_limiter(provider, key=None):
+    """
+    Returns the process-wide ProviderLimiter of a provider, built from PROVIDER_LIMITS.
+
+    Args:
+        provider: 'openai', 'groq' or 'ollama'.
+        key: The key_id of the API key, so each key of a pool has its own quota; None shares
+            one limiter across the provider.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get((provider, key))
+        if limiter is None:
+            limiter = _limiters[(provider, key)] = ProviderLimiter(*PROVIDER_LIMITS.get(provider, (None, None)))
+        return limiter
+
+
+def configure_limiter(provider, requests_per_minute=None, tokens_per_minute=None):
+    """
+    Replaces the limits of a provider, e.g. for a higher usage tier. The limits apply to
+    each of its API keys.
+    """
+    with _limiters_lock:
+        PROVIDER_LIMITS[provider] = (requests_per_minute, tokens_per_minute)
+        for name in [name for name in _limiters if name[0] == provider]:
+            del _limiters[name]
+        limiter = _limiters[(provider, None)] = ProviderLimiter(requests_per_minute, tokens_per_minute)
+        return limiter
@@ -0,0 +1,236 @@
+import hashlib
+import logging
+import pathlib
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from chatter import ChatterWrapper, is_error_response
+
+# Exact-match response cache for the chatter classes.
+#
+# Responses are keyed by (backend, model, normalized prompt), where normalisation collapses
+# runs of whitespace. Lookups go to an in-memory LRU first and then, if configured, to a SQLite
+# store that survives restarts. The store expires entries after ttl seconds and evicts the
+# least recently used entries once its total size exceeds max_disk_bytes. Error responses
+# from a failed API call are never cached.
+
+CACHE_FILE = "./memory/cache/responses.sqlite"
+
+
+def normalize_prompt(prompt):
+    return ' '.join(str(prompt).split())
+
+
+class ResponseCache:
+    """
+    In-memory LRU with an optional persistent SQLite store.
+
+    Args:
+        capacity: The number of responses kept in memory.
+        path: The SQLite file, or None for a memory-only cache.
+        ttl: Seconds a stored response stays valid; None keeps responses until evicted.
+        max_disk_bytes: The total response size kept on disk.
+    """
+    def __init__(self, capacity=1024, path=CACHE_FILE, ttl=24 * 60 * 60, max_disk_bytes=64 * 1024 * 1024):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()  # key -> (response, created)
+        self.stats = Counter()  # hits, memory_hits, disk_hits, misses, stores, expired, evicted
+        self.lock = threading.Lock()
+        self.db = None
+        if path is not None:
+            pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(str(path), check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                            "created REAL NOT NULL, accessed REAL NOT NULL, size INTEGER NOT NULL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self.db.commit()
+            self.disk_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(backend, model, prompt):
+        return hashlib.sha256(f"{backend}\0{model}\0{normalize_prompt(prompt)}".encode('utf-8')).hexdigest()
+
+    def expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key):
+        """
+        Returns the cached response for a key, or None.
+        """
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if not self.expired(entry[1], now):
+                    self.memory.move_to_end(key)
+                    self.stats['hits'] += 1
+                    self.stats['memory_hits'] += 1
+                    return entry[0]
+                del self.memory[key]
+                self.stats['expired'] += 1
+            if self.db is not None:
+                row = self.db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if not self.expired(row[1], now):
+                        self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                        self.db.commit()
+                        self.remember(key, row[0], row[1])
+                        self.stats['hits'] += 1
+                        self.stats['disk_hits'] += 1
+                        return row[0]
+                    self.delete_stored(key)
+                    self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key, response):
+        now = time.time()
+        with self.lock:
+            self.remember(key, response, now)
+            self.stats['stores'] += 1
+            if self.db is not None:
+                size = len(response.encode('utf-8'))
+                self.delete_stored(key)
+                self.db.execute("INSERT INTO responses (key, response, created, accessed, size) VALUES (?, ?, ?, ?, ?)",
+                                (key, response, now, now, size))
+                self.disk_bytes += size
+                self.evict_stored()
+                self.db.commit()
+
+    def remember(self, key, response, created):
+        self.memory[key] = (response, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def delete_stored(self, key):
+        row = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.disk_bytes -= row[0]
+
+    def evict_stored(self):
+        if self.ttl is not None:
+            expired = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE created < ?",
+                                      (time.time() - self.ttl,)).fetchone()
+            if expired[0]:
+                self.db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+                self.disk_bytes -= expired[1]
+                self.stats['expired'] += expired[0]
+        while self.disk_bytes > self.max_disk_bytes:
+            rows = self.db.execute("SELECT key, size FROM responses ORDER BY accessed LIMIT 64").fetchall()
+            if not rows:
+                break
+            evicted = []
+            for key, size in rows:
+                evicted.append((key,))
+                self.disk_bytes -= size
+                self.memory.pop(key, None)
+                self.stats['evicted'] += 1
+                if self.disk_bytes <= self.max_disk_bytes:
+                    break
+            self.db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses")
+                self.db.commit()
+                self.disk_bytes = 0
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Returns the process-wide ResponseCache at CACHE_FILE, so re-initialised chatters keep
+    their cached responses and share one SQLite connection.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+class CachedChatter(ChatterWrapper):
+    """
+    Wraps a chatter so identical prompts are answered from a ResponseCache.
+
+    Args:
+        chatter: A GPT4o, GroqModel, OllamaModel or another wrapper.
+        cache: The ResponseCache to use; defaults to the shared cache from get_response_cache.
+    """
+    def __init__(self, chatter, cache=None):
+        super().__init__(chatter)
+        self.cache = cache if cache is not None else get_response_cache()
+
+    @property
+    def stats(self):
+        return self.cache.stats
+
+    def lookup(self, knowledge, model, bypass_cache):
+        key = self.cache.make_key(self.backend, model or self.default_model, knowledge)
+        if bypass_cache:
+            self.cache.stats['bypassed'] += 1
+            return key, None
+        return key, self.cache.get(key)
+
+    def store(self, key, response):
+        if is_error_response(response):
+            logging.debug("Not caching error response")
+        else:
+            self.cache.put(key, response)
+
+    def generate_response(self, knowledge, model=None, bypass_cache=False, **options):
+        """
+        Returns a cached response, or calls the chatter and caches its response.
+
+        Args:
+            knowledge: The prompt text.
+            model: The model name; defaults to the chatter's default model.
+            bypass_cache: Skip the lookup and call the chatter; the fresh response is still stored.
+            **options: Passed to the chatter, e.g. max_tokens and budget.
+        """
+        key, response = self.lookup(knowledge, model, bypass_cache)
+        if response is None:
+            response = self.forward(knowledge, model, bypass_cache=bypass_cache, **options)
+            self.store(key, response)
+        return response
+
+    async def generate_response_async(self, knowledge, model=None, bypass_cache=False, **options):
+        """
+        Async counterpart of generate_response.
+        """
+        key, response = self.lookup(knowledge, model, bypass_cache)
+        if response is None:
+            response = await self.forward_async(knowledge, model, bypass_cache=bypass_cache, **options)
+            self.store(key, response)
+        return response
+
+    async def stream_response_async(self, knowledge, model=None, bypass_cache=False, **options):
+        """
+        Streaming counterpart of generate_response; a cached response arrives as one chunk and
+        a streamed one is stored only if it was read to the end.
+        """
+        key, response = self.lookup(knowledge, model, bypass_cache)
+        if response is not None:
+            yield response
+            return
+        chunks = []
+        async for chunk in self.forward_stream(knowledge, model, bypass_cache=bypass_cache, **options):
+            chunks.append(chunk)
+            yield chunk
+        self.store(key, ''.join(chunks))
@@ -0,0 +1,360 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from collections import Counter, deque
+from budget import BudgetExceeded
+from chatter import GPT4o, GroqModel, OllamaModel, get_chatter, is_error_response, stream_from
+from keypool import build_key_pool
+
+# Latency-aware routing across chatter backends.
+#
+# Each backend keeps a rolling window of its recent call latencies and outcomes. A request goes
+# to the healthy backend with the lowest median latency; backends that have not answered yet
+# are tried first, so every backend is measured, and every probe_every-th request goes to the
+# healthy backend used least recently, so a backend that was slow once gets measured again.
+# Fallback backends are only used once the others have failed. A failed call (an error
+# response or an exception) fails over to the next backend. A backend that fails
+# failure_threshold times in a row, or whose error rate over the window reaches
+# max_error_rate, is benched for cooldown seconds and then probed again. With hedging on, a
+# request still running after the primary backend's hedge_percentile latency is also sent to
+# the next backend, and the first good answer wins.
+
+
+class BackendStats:
+    """
+    Rolling latency and error statistics of one backend.
+
+    Args:
+        chatter: The chatter for this backend.
+        window: The number of recent calls kept.
+        fallback: Only use this backend once the others have failed.
+        name: The name in backend_stats and logs; defaults to the chatter's backend name.
+    """
+    def __init__(self, chatter, window=50, fallback=False, name=None):
+        self.chatter = chatter
+        self.name = name or getattr(chatter, 'backend', None) or type(chatter).__name__
+        self.fallback = fallback
+        self.last_used = 0.0
+        self.latencies = deque(maxlen=window)  # seconds of successful calls
+        self.outcomes = deque(maxlen=window)  # True for success
+        self.consecutive_failures = 0
+        self.benched_until = 0.0
+        self.counts = Counter()  # calls, errors, benched
+
+    def record(self, latency, ok):
+        self.last_used = time.monotonic()
+        self.counts['calls'] += 1
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+        else:
+            self.counts['errors'] += 1
+            self.consecutive_failures += 1
+
+    def percentile(self, p):
+        # Nearest-rank percentile of the successful latencies, or None without samples
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        rank = max(1, -(-len(ordered) * p // 100))
+        return ordered[int(rank) - 1]
+
+    @property
+    def error_rate(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def benched(self, now):
+        return now < self.benched_until
+
+    def summary(self):
+        return {'calls': self.counts['calls'], 'errors': self.counts['errors'], 'benched': self.counts['benched'],
+                'error_rate': round(self.error_rate, 3), 'p50': self.percentile(50), 'p95': self.percentile(95)}
+
+
+class RouterChatter:
+    """
+    Sends each request to the fastest healthy backend, failing over and optionally hedging.
+
+    Args:
+        chatters: The backend chatters, in order of preference when latencies are unknown.
+        fallbacks: Chatters tried only after every backend in chatters has failed, e.g. a
+            local model.
+        hedge: Also send a slow request to the next backend.
+        hedge_percentile: The primary backend's latency percentile to wait before hedging.
+        min_samples: The successful calls a backend needs before its latency is used to hedge.
+        window: The number of recent calls kept per backend.
+        max_error_rate: The error rate over a full window that benches a backend.
+        failure_threshold: The consecutive failures that bench a backend.
+        cooldown: Seconds a benched backend is skipped before it is probed again.
+        probe_every: Every probe_every-th request goes first to the healthy backend used least
+            recently; 0 turns probing off.
+    """
+    def __init__(self, chatters, fallbacks=(), hedge=False, hedge_percentile=95, min_samples=5, window=50,
+                 max_error_rate=0.5, failure_threshold=3, cooldown=30.0, probe_every=20):
+        if not chatters:
+            raise ValueError("RouterChatter needs at least one chatter")
+        self.backends = []
+        names = Counter()
+        for chatter, fallback in [(chatter, False) for chatter in chatters] + [(chatter, True) for chatter in fallbacks]:
+            name = getattr(chatter, 'backend', None) or type(chatter).__name__
+            names[name] += 1
+            if names[name] > 1:
+                name = f"{name}#{names[name]}"  # Two backends of one class, e.g. two OllamaModel servers
+            self.backends.append(BackendStats(chatter, window, fallback, name))
+        self.probe_every = probe_every
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.stats = Counter()  # requests, probes, failovers, hedged, hedge_wins, exhausted
+        self.executor = None
+
+    def backend_stats(self):
+        return {backend.name: backend.summary() for backend in self.backends}
+
+    def ranked(self):
+        """
+        Returns the backends in the order to try them: untried ones, then healthy ones by
+        median latency, then fallbacks, then ones with a high error rate, then benched ones, so
+        a request is still attempted when every backend is benched. Every probe_every-th
+        request puts the healthy backend used least recently first.
+        """
+        now = time.monotonic()
+        with self.lock:
+            def failing(backend):
+                return len(backend.outcomes) > 0 and backend.error_rate >= self.max_error_rate
+
+            def rank(item):
+                index, backend = item
+                latency = backend.percentile(50)
+                return (backend.benched(now), failing(backend), backend.fallback, latency is not None, latency or 0.0, index)
+            ranked = [backend for _, backend in sorted(enumerate(self.backends), key=rank)]
+            if self.probe_every and self.stats['requests'] % self.probe_every == 0:
+                healthy = [backend for backend in ranked[1:]
+                           if not (backend.benched(now) or failing(backend) or backend.fallback)]
+                if healthy:
+                    probe = min(healthy, key=lambda backend: backend.last_used)
+                    ranked.remove(probe)
+                    ranked.insert(0, probe)
+                    self.stats['probes'] += 1
+            return ranked
+
+    def record(self, backend, latency, ok):
+        with self.lock:
+            backend.record(latency, ok)
+            window_full = len(backend.outcomes) == backend.outcomes.maxlen
+            if not ok and (backend.consecutive_failures >= self.failure_threshold
+                           or (window_full and backend.error_rate >= self.max_error_rate)):
+                if not backend.benched(time.monotonic()):
+                    backend.counts['benched'] += 1
+                    logging.warning(f"router: benching {backend.name} for {self.cooldown}s after repeated errors")
+                backend.benched_until = time.monotonic() + self.cooldown
+
+    def hedge_delay(self, backend):
+        if not self.hedge or len(backend.latencies) < self.min_samples:
+            return None
+        with self.lock:
+            return backend.percentile(self.hedge_percentile)
+
+    @staticmethod
+    def options_for(backend, model, options):
+        # model is backend specific; None lets each backend use its own default
+        if model is not None:
+            options = dict(options, model=model)
+        return options
+
+    def call(self, backend, knowledge, model, options):
+        # One timed call; returns (response, error) and records the outcome
+        start = time.monotonic()
+        try:
+            response = backend.chatter.generate_response(knowledge, **self.options_for(backend, model, options))
+        except BudgetExceeded:
+            raise
+        except Exception as e:
+            logging.error(f"router: {backend.name} raised {e!r}")
+            self.record(backend, time.monotonic() - start, False)
+            return None, e
+        ok = not is_error_response(response)
+        self.record(backend, time.monotonic() - start, ok)
+        return response, None
+
+    async def call_async(self, backend, knowledge, model, options):
+        start = time.monotonic()
+        try:
+            chatter = backend.chatter
+            kwargs = self.options_for(backend, model, options)
+            if hasattr(chatter, 'generate_response_async'):
+                response = await chatter.generate_response_async(knowledge, **kwargs)
+            else:
+                response = await asyncio.to_thread(chatter.generate_response, knowledge, **kwargs)
+        except (BudgetExceeded, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            logging.error(f"router: {backend.name} raised {e!r}")
+            self.record(backend, time.monotonic() - start, False)
+            return None, e
+        ok = not is_error_response(response)
+        self.record(backend, time.monotonic() - start, ok)
+        return response, None
+
+    def exhausted(self, response, error):
+        # Every backend failed: return the last error response, as a single chatter would
+        self.stats['exhausted'] += 1
+        if response is None and error is not None:
+            raise error
+        return response
+
+    def generate_response(self, knowledge, model=None, **options):
+        """
+        Returns the response of the first backend to answer without an error.
+
+        Args:
+            knowledge: The prompt text.
+            model: Passed to every backend; None uses each backend's default model.
+            **options: Passed to the backends, e.g. max_tokens and budget.
+        """
+        self.stats['requests'] += 1
+        queue = self.ranked()
+        response, error = None, None
+        while queue:
+            backend = queue.pop(0)
+            delay = self.hedge_delay(backend) if queue else None
+            if delay is None:
+                response, error = self.call(backend, knowledge, model, options)
+                if error is None and not is_error_response(response):
+                    return response
+            else:
+                response, error, winner = self.hedged(backend, queue, delay, knowledge, model, options)
+                if winner is not None:
+                    return response
+            if queue:
+                self.stats['failovers'] += 1
+        return self.exhausted(response, error)
+
+    def hedged(self, primary, queue, delay, knowledge, model, options):
+        # Runs primary and, if it is slower than delay, the next backend in a thread; the losing
+        # thread cannot be interrupted, so its result is only recorded. Returns (response, error,
+        # winning backend or None).
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix='router-hedge')
+        running = {self.executor.submit(self.call, primary, knowledge, model, options): primary}
+        done, _ = concurrent.futures.wait(running, timeout=delay)
+        if not done:
+            secondary = queue.pop(0)
+            self.stats['hedged'] += 1
+            running[self.executor.submit(self.call, secondary, knowledge, model, options)] = secondary
+        response, error = None, None
+        for future in concurrent.futures.as_completed(running):
+            response, error = future.result()
+            if error is None and not is_error_response(response):
+                if running[future] is not primary:
+                    self.stats['hedge_wins'] += 1
+                return response, None, running[future]
+        return response, error, None
+
+    async def generate_response_async(self, knowledge, model=None, **options):
+        """
+        Async counterpart of generate_response; a hedged request cancels the slower call.
+        """
+        self.stats['requests'] += 1
+        queue = self.ranked()
+        response, error = None, None
+        while queue:
+            backend = queue.pop(0)
+            delay = self.hedge_delay(backend) if queue else None
+            if delay is None:
+                response, error = await self.call_async(backend, knowledge, model, options)
+                if error is None and not is_error_response(response):
+                    return response
+            else:
+                response, error, winner = await self.hedged_async(backend, queue, delay, knowledge, model, options)
+                if winner is not None:
+                    return response
+            if queue:
+                self.stats['failovers'] += 1
+        return self.exhausted(response, error)
+
+    async def hedged_async(self, primary, queue, delay, knowledge, model, options):
+        running = {asyncio.ensure_future(self.call_async(primary, knowledge, model, options)): primary}
+        try:
+            done, _ = await asyncio.wait(running, timeout=delay)
+            if not done:
+                secondary = queue.pop(0)
+                self.stats['hedged'] += 1
+                running[asyncio.ensure_future(self.call_async(secondary, knowledge, model, options))] = secondary
+            response, error = None, None
+            pending = set(running)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    response, error = task.result()
+                    if error is None and not is_error_response(response):
+                        if running[task] is not primary:
+                            self.stats['hedge_wins'] += 1
+                        return response, None, running[task]
+            return response, error, None
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def stream_response_async(self, knowledge, model=None, **options):
+        """
+        Streaming counterpart of generate_response_async. A backend that fails before its first
+        chunk fails over to the next one; a failure after that is raised, since part of the
+        reply has already been passed on. Streams are not hedged.
+        """
+        self.stats['requests'] += 1
+        queue = self.ranked()
+        error = None
+        while queue:
+            backend = queue.pop(0)
+            start = time.monotonic()
+            started = False
+            try:
+                async for chunk in stream_from(backend.chatter, knowledge, **self.options_for(backend, model, options)):
+                    started = True
+                    yield chunk
+            except (BudgetExceeded, asyncio.CancelledError):
+                raise
+            except Exception as e:
+                logging.error(f"router: {backend.name} raised {e!r}")
+                self.record(backend, time.monotonic() - start, False)
+                if started:
+                    raise
+                error = e
+                if queue:
+                    self.stats['failovers'] += 1
+                continue
+            self.record(backend, time.monotonic() - start, True)
+            return
+        self.exhausted(None, error)
+
+
+def build_router(openai_keys=None, groq_keys=None, ollama=True, key_strategy='least_loaded', **router_options):
+    """
+    Returns a RouterChatter over the backends that have keys, with a local Ollama server as the
+    last resort, or None when no API key is given. A backend with several keys spreads its
+    requests across them through a KeyPoolChatter.
+
+    Args:
+        openai_keys: The OpenAI API key or list of keys, or None.
+        groq_keys: The Groq API key or list of keys, or None.
+        ollama: Add OllamaModel as a fallback backend.
+        key_strategy: 'least_loaded' or 'round_robin' for backends with several keys.
+        **router_options: Passed to RouterChatter, e.g. hedge=True.
+    """
+    chatters = []
+    for chatter_class, keys in ((GPT4o, openai_keys), (GroqModel, groq_keys)):
+        keys = [key for key in ([keys] if isinstance(keys, str) else keys or ()) if key]
+        if keys:
+            chatters.append(build_key_pool(chatter_class, keys, strategy=key_strategy))
+    if not chatters:
+        return None
+    fallbacks = [get_chatter(OllamaModel)] if ollama else []
+    return RouterChatter(chatters, fallbacks, **router_options)
@@ -0,0 +1,264 @@
+import hashlib
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from chatter import ChatterWrapper, is_error_response
+from extraction import FORMAT_INSTRUCTIONS
+
+# Near-duplicate response cache for the chatter classes.
+#
+# A prompt is reduced to the set of its lowercased words, so prompts that differ only in
+# whitespace, punctuation or word order have the same set; shingle_size > 1 uses runs of
+# consecutive words instead, for callers that need word order to count. The structured format
+# instructions are left out, so that shared boilerplate cannot make unrelated prompts look
+# alike. Each set is fingerprinted with MinHash: num_perm hash functions, each keeping the
+# minimum hash over the set, so two signatures agree in a fraction of positions that
+# estimates the Jaccard similarity of the sets. Signatures are
+# split into bands that are hashed into LSH buckets; only prompts sharing at least one
+# bucket are compared, so a lookup does not scan the whole cache. Candidates with a
+# different number of negations are never a match; the rest are scored by exact Jaccard
+# similarity and the best one at or above the threshold is returned. Everything runs
+# locally without an embedding service.
+#
+# Conclusion prompts are not matched at all: a conclusion over one more premise, or over
+# the same premises about someone else, is a different conclusion however similar the
+# prompts are. They pass straight through to the wrapped chatter.
+
+MERSENNE_PRIME = (1 << 61) - 1
+WORD_PATTERN = re.compile(r"\w+(?:'\w+)?")
+NEGATIONS = frozenset(('not', 'no', 'never', 'nor', 'neither', 'none', 'nothing', 'nobody', 'nowhere', 'cannot'))
+
+
+def prompt_words(prompt):
+    # The lowercased words of a prompt in order, without the structured format instructions
+    return WORD_PATTERN.findall(str(prompt).replace(FORMAT_INSTRUCTIONS, '').lower())
+
+
+def shingles(words, size=1):
+    # Runs of size consecutive words; size 1 is the plain word set, which ignores word order
+    if size <= 1 or len(words) < size:
+        return frozenset(words)
+    return frozenset(' '.join(words[i:i + size]) for i in range(len(words) - size + 1))
+
+
+def negation_count(words):
+    return sum(1 for word in words if word in NEGATIONS or word.endswith("n't"))
+
+
+def is_conclusion_prompt(prompt):
+    return FORMAT_INSTRUCTIONS in str(prompt)
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """
+    MinHash signatures over word sets.
+
+    Args:
+        num_perm: The number of hash functions, i.e. the signature length.
+        seed: Seed for the hash function coefficients.
+    """
+    def __init__(self, num_perm=64, seed=1):
+        self.num_perm = num_perm
+        self.coefficients = []
+        for i in range(num_perm):
+            digest = hashlib.blake2b(f"{seed}:{i}".encode('utf-8'), digest_size=16).digest()
+            a = int.from_bytes(digest[:8], 'little') % (MERSENNE_PRIME - 1) + 1
+            b = int.from_bytes(digest[8:], 'little') % MERSENNE_PRIME
+            self.coefficients.append((a, b))
+
+    @staticmethod
+    def word_hash(word):
+        return int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def signature(self, words):
+        hashes = [self.word_hash(word) for word in words] or [0]
+        return tuple(min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in self.coefficients)
+
+
+class NearDuplicateCache:
+    """
+    Cache of responses looked up by prompt similarity through an LSH index.
+
+    Args:
+        threshold: The minimum Jaccard similarity of the word sets for a hit.
+        num_perm: The MinHash signature length.
+        bands: The number of LSH bands; num_perm must be divisible by it. More bands find
+            less similar candidates.
+        capacity: The number of responses kept; the least recently used is evicted first.
+        min_words: Prompts with fewer distinct words are not cached, since changing one word
+            of a very short prompt easily changes its meaning.
+        shingle_size: Compare runs of this many consecutive words; 1 compares word sets, so
+            word order does not matter.
+    """
+    def __init__(self, threshold=0.9, num_perm=64, bands=16, capacity=4096, min_words=4, shingle_size=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.capacity = capacity
+        self.min_words = min_words
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+        self.entries = OrderedDict()  # entry id -> (scope, shingles, negations, band keys, response)
+        self.buckets = defaultdict(set)  # (scope, band, band hash) -> entry ids
+        self.next_id = 0
+        self.stats = Counter()  # hits, misses, stores, skipped, passed, candidates, evicted
+        self.lock = threading.Lock()
+
+    def band_keys(self, scope, signature):
+        return [(scope, band, hash(signature[band * self.rows:(band + 1) * self.rows]))
+                for band in range(self.bands)]
+
+    def fingerprint(self, prompt):
+        # (word set or shingles, negation count), or None for a prompt too short to cache
+        words = prompt_words(prompt)
+        if len(set(words)) < self.min_words:
+            return None
+        return shingles(words, self.shingle_size), negation_count(words)
+
+    def lookup(self, scope, prompt):
+        """
+        Returns the stored response of the most similar prompt in scope, or None.
+
+        Args:
+            scope: Separates caches, e.g. (backend, model).
+            prompt: The prompt text.
+        """
+        fingerprint = self.fingerprint(prompt)
+        if fingerprint is None:
+            self.stats['skipped'] += 1
+            return None
+        words, negations = fingerprint
+        keys = self.band_keys(scope, self.hasher.signature(words))
+        with self.lock:
+            candidates = set().union(*(self.buckets.get(key, ()) for key in keys))
+            self.stats['candidates'] += len(candidates)
+            best, best_similarity = None, self.threshold
+            for entry_id in candidates:
+                _, entry_words, entry_negations, _, _ = self.entries[entry_id]
+                if entry_negations != negations:
+                    continue  # 'x is a man' and 'x is not a man' are opposites, not duplicates
+                similarity = jaccard(words, entry_words)
+                if similarity >= best_similarity:
+                    best, best_similarity = entry_id, similarity
+            if best is None:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(best)
+            self.stats['hits'] += 1
+            return self.entries[best][4]
+
+    def store(self, scope, prompt, response):
+        fingerprint = self.fingerprint(prompt)
+        if fingerprint is None:
+            return
+        words, negations = fingerprint
+        keys = self.band_keys(scope, self.hasher.signature(words))
+        with self.lock:
+            entry_id = self.next_id
+            self.next_id += 1
+            self.entries[entry_id] = (scope, words, negations, keys, response)
+            for key in keys:
+                self.buckets[key].add(entry_id)
+            self.stats['stores'] += 1
+            while len(self.entries) > self.capacity:
+                self.evict()
+
+    def evict(self):
+        entry_id, (_, _, _, keys, _) = self.entries.popitem(last=False)
+        for key in keys:
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self.buckets[key]
+        self.stats['evicted'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.buckets.clear()
+
+
+class NearDuplicateChatter(ChatterWrapper):
+    """
+    Wraps a chatter so prompts similar to an earlier prompt reuse its response. Conclusion
+    prompts are passed through unmatched.
+
+    Args:
+        chatter: A GPT4o, GroqModel, OllamaModel or another wrapper.
+        cache: The NearDuplicateCache to use; defaults to a new one.
+    """
+    def __init__(self, chatter, cache=None):
+        super().__init__(chatter)
+        self.cache = cache if cache is not None else NearDuplicateCache()
+
+    @property
+    def stats(self):
+        return self.cache.stats
+
+    def generate_response(self, knowledge, model=None, bypass_cache=False, **options):
+        """
+        Returns the response of a near-duplicate prompt, or calls the chatter and stores its
+        response.
+
+        Args:
+            knowledge: The prompt text.
+            model: The model name; defaults to the chatter's default model.
+            bypass_cache: Skip the lookup and call the chatter; the fresh response is still stored.
+            **options: Passed to the chatter, e.g. max_tokens and budget.
+        """
+        if is_conclusion_prompt(knowledge):
+            self.cache.stats['passed'] += 1
+            return self.forward(knowledge, model, bypass_cache=bypass_cache, **options)
+        scope = (self.backend, model or self.default_model)
+        response = None if bypass_cache else self.cache.lookup(scope, knowledge)
+        if response is None:
+            response = self.forward(knowledge, model, bypass_cache=bypass_cache, **options)
+            if not is_error_response(response):
+                self.cache.store(scope, knowledge, response)
+        return response
+
+    async def generate_response_async(self, knowledge, model=None, bypass_cache=False, **options):
+        """
+        Async counterpart of generate_response.
+        """
+        if is_conclusion_prompt(knowledge):
+            self.cache.stats['passed'] += 1
+            return await self.forward_async(knowledge, model, bypass_cache=bypass_cache, **options)
+        scope = (self.backend, model or self.default_model)
+        response = None if bypass_cache else self.cache.lookup(scope, knowledge)
+        if response is None:
+            response = await self.forward_async(knowledge, model, bypass_cache=bypass_cache, **options)
+            if not is_error_response(response):
+                self.cache.store(scope, knowledge, response)
+        return response
+
+    async def stream_response_async(self, knowledge, model=None, bypass_cache=False, **options):
+        """
+        Streaming counterpart of generate_response, see CachedChatter.stream_response_async.
+        """
+        if is_conclusion_prompt(knowledge):
+            self.cache.stats['passed'] += 1
+            async for chunk in self.forward_stream(knowledge, model, bypass_cache=bypass_cache, **options):
+                yield chunk
+            return
+        scope = (self.backend, model or self.default_model)
+        response = None if bypass_cache else self.cache.lookup(scope, knowledge)
+        if response is not None:
+            yield response
+            return
+        chunks = []
+        async for chunk in self.forward_stream(knowledge, model, bypass_cache=bypass_cache, **options):
+            chunks.append(chunk)
+            yield chunk
+        response = ''.join(chunks)
+        if not is_error_response(response):
+            self.cache.store(scope, knowledge, response)
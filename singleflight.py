@@ -0,0 +1,238 @@
+import asyncio
+import threading
+from collections import Counter
+from budget import BudgetExceeded
+from chatter import ChatterWrapper
+from response_cache import normalize_prompt
+
+# Request coalescing for the chatter classes.
+#
+# The first caller of a (backend, model, prompt, max_tokens) key becomes the leader and makes
+# the upstream call. Callers arriving with the same key while that call is in flight wait for
+# it and receive its response instead of sending their own request. Once the call returns, the
+# key is released, so later calls go upstream again (or to a cache layer below). Threaded
+# callers of generate_response and coroutines calling generate_response_async are coalesced
+# separately; coroutines share an asyncio future on their event loop instead of blocking.
+# A streamed call (stream_response_async) is read from the provider by a pump task into a
+# StreamFlight. Identical streamed calls replay the chunks received so far and then follow
+# the stream live. Identical generate_response_async calls wait for the joined text. A
+# streamed call arriving while an unstreamed one is in flight gets its response as one
+# chunk. The pump is cancelled once every stream reader has stopped reading.
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+        self.followers = 0
+
+
+class AsyncFlight:
+    def __init__(self, loop):
+        self.future = loop.create_future()
+        self.followers = 0
+
+
+class StreamFlight(AsyncFlight):
+    def __init__(self, loop):
+        super().__init__(loop)
+        self.chunks = []
+        self.updated = asyncio.Event()  # Replaced after every chunk; readers wait on the current one
+        self.readers = 0
+        self.task = None
+
+    def notify(self):
+        updated, self.updated = self.updated, asyncio.Event()
+        updated.set()
+
+
+class SingleFlightChatter(ChatterWrapper):
+    """
+    Wraps a chatter so concurrent identical requests share one upstream call.
+
+    Args:
+        chatter: A GPT4o, GroqModel, OllamaModel or another wrapper.
+    """
+    def __init__(self, chatter):
+        super().__init__(chatter)
+        self.flights = {}  # key -> Flight in progress
+        self.async_flights = {}  # (event loop, key) -> AsyncFlight in progress
+        self.lock = threading.Lock()
+        self.stats = Counter()  # calls, upstream, collapsed, max_followers
+
+    def flight_key(self, knowledge, model, options):
+        return (self.backend, model or self.default_model, normalize_prompt(knowledge), options.get('max_tokens'))
+
+    def uncollapse(self):
+        with self.lock:
+            self.stats['collapsed'] -= 1
+            self.stats['upstream'] += 1
+
+    def count(self, leader, followers=0):
+        with self.lock:
+            self.stats['calls'] += 1
+            if leader:
+                self.stats['upstream'] += 1
+            else:
+                self.stats['collapsed'] += 1
+                self.stats['max_followers'] = max(self.stats['max_followers'], followers)
+
+    def generate_response(self, knowledge, model=None, **options):
+        """
+        Returns the response of an identical in-flight call, or makes the call.
+
+        Args:
+            knowledge: The prompt text.
+            model: The model name; defaults to the chatter's default model.
+            **options: Passed to the chatter, e.g. max_tokens and budget.
+        """
+        if options.get('bypass_cache'):
+            self.count(leader=True)
+            return self.forward(knowledge, model, **options)
+
+        key = self.flight_key(knowledge, model, options)
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+            else:
+                flight.followers += 1
+        self.count(leader, flight.followers)
+
+        if not leader:
+            flight.done.wait()
+            if isinstance(flight.error, BudgetExceeded):
+                # The leader ran out of its own budget; this caller's budget may still allow the call
+                self.uncollapse()
+                return self.forward(knowledge, model, **options)
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+
+        try:
+            flight.response = self.forward(knowledge, model, **options)
+            return flight.response
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+    async def generate_response_async(self, knowledge, model=None, **options):
+        """
+        Async counterpart of generate_response.
+        """
+        if options.get('bypass_cache'):
+            self.count(leader=True)
+            return await self.forward_async(knowledge, model, **options)
+
+        loop = asyncio.get_running_loop()
+        key = (loop, self.flight_key(knowledge, model, options))
+        flight = self.async_flights.get(key)
+        if flight is not None:
+            flight.followers += 1
+            self.count(leader=False, followers=flight.followers)
+            try:
+                return await asyncio.shield(flight.future)
+            except asyncio.CancelledError:
+                if not flight.future.cancelled():
+                    raise  # this caller was cancelled
+            except BudgetExceeded:
+                pass
+            # The leader was cancelled or ran out of its own budget; make the call instead
+            self.uncollapse()
+            return await self.forward_async(knowledge, model, **options)
+
+        flight = self.async_flights[key] = AsyncFlight(loop)
+        future = flight.future
+        self.count(leader=True)
+        try:
+            response = await self.forward_async(knowledge, model, **options)
+            future.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved when no caller is waiting
+            raise
+        finally:
+            del self.async_flights[key]
+
+    async def pump(self, key, flight, knowledge, model, options):
+        # Reads the upstream stream into flight for every reader; the outcome lands in flight.future
+        try:
+            async for chunk in self.forward_stream(knowledge, model, **options):
+                flight.chunks.append(chunk)
+                flight.notify()
+            flight.future.set_result(''.join(flight.chunks))
+        except asyncio.CancelledError:
+            flight.future.cancel()
+        except Exception as e:
+            flight.future.set_exception(e)
+            flight.future.exception()  # Mark as retrieved when no caller is waiting
+        finally:
+            if self.async_flights.get(key) is flight:
+                del self.async_flights[key]
+            flight.notify()
+
+    async def stream_response_async(self, knowledge, model=None, **options):
+        """
+        Streaming counterpart of generate_response_async: concurrent identical calls share one
+        upstream stream, and each reader receives every chunk from the start.
+        """
+        if options.get('bypass_cache'):
+            self.count(leader=True)
+            async for chunk in self.forward_stream(knowledge, model, **options):
+                yield chunk
+            return
+
+        loop = asyncio.get_running_loop()
+        key = (loop, self.flight_key(knowledge, model, options))
+        flight = self.async_flights.get(key)
+        if flight is not None and not isinstance(flight, StreamFlight):
+            # An unstreamed call is in flight; its response arrives as one chunk
+            yield await self.generate_response_async(knowledge, model, **options)
+            return
+
+        leader = flight is None
+        if leader:
+            flight = self.async_flights[key] = StreamFlight(loop)
+            flight.task = loop.create_task(self.pump(key, flight, knowledge, model, dict(options)))
+            self.count(leader=True)
+        else:
+            flight.followers += 1
+            self.count(leader=False, followers=flight.followers)
+
+        flight.readers += 1
+        index = 0
+        try:
+            while True:
+                updated = flight.updated
+                while index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                if flight.future.done():
+                    break
+                await updated.wait()
+            error = None if flight.future.cancelled() else flight.future.exception()
+        finally:
+            flight.readers -= 1
+            if not flight.readers and not flight.future.done():
+                flight.task.cancel()  # Nobody is reading any more
+
+        if not leader and not index and (flight.future.cancelled() or isinstance(error, BudgetExceeded)):
+            # The stream was abandoned or the leader ran out of its own budget; make the call instead
+            self.uncollapse()
+            async for chunk in self.forward_stream(knowledge, model, **options):
+                yield chunk
+            return
+        if flight.future.cancelled():
+            raise asyncio.CancelledError()
+        if error is not None:
+            raise error
@@ -0,0 +1,231 @@
+from expression import BinaryOp, Constant, Not, Variable
+
+# Satisfiability backend for LogicTables.
+#
+# Formulas are turned into CNF with the Tseitin transformation (one fresh variable per
+# connective, so the clause count stays linear in the size of the expression) and solved by
+# a DPLL search with two watched literals for unit propagation. Validity of F is decided by
+# asking whether (not F) is satisfiable; a model of (not F) is a counterexample to F.
+
+
+class CNFEncoder:
+    def __init__(self):
+        self.clauses = []
+        self.num_vars = 0
+        self.variable_ids = {}  # Variable name -> CNF variable id
+        self.constant_lit = None
+
+    def new_var(self):
+        self.num_vars += 1
+        return self.num_vars
+
+    def variable(self, name):
+        if name not in self.variable_ids:
+            self.variable_ids[name] = self.new_var()
+        return self.variable_ids[name]
+
+    def true_lit(self):
+        if self.constant_lit is None:
+            self.constant_lit = self.new_var()
+            self.clauses.append([self.constant_lit])
+        return self.constant_lit
+
+    def encode(self, node):
+        """
+        Encodes a syntax tree node and returns the literal equivalent to it.
+        """
+        if isinstance(node, Variable):
+            return self.variable(node.name)
+        if isinstance(node, Constant):
+            return self.true_lit() if node.value else -self.true_lit()
+        if isinstance(node, Not):
+            return -self.encode(node.operand)
+        if isinstance(node, BinaryOp):
+            a = self.encode(node.left)
+            b = self.encode(node.right)
+            if node.operator == 'and':
+                return self.conjunction(a, b)
+            if node.operator == 'nand':
+                return -self.conjunction(a, b)
+            if node.operator == 'or':
+                return -self.conjunction(-a, -b)
+            if node.operator == 'nor':
+                return self.conjunction(-a, -b)
+            if node.operator == 'implication':
+                return -self.conjunction(a, -b)
+            if node.operator == 'xor':
+                return self.exclusive(a, b)
+        raise ValueError(f"Cannot encode node {node!r}")
+
+    def conjunction(self, a, b):
+        x = self.new_var()
+        self.clauses.append([-x, a])
+        self.clauses.append([-x, b])
+        self.clauses.append([x, -a, -b])
+        return x
+
+    def exclusive(self, a, b):
+        x = self.new_var()
+        self.clauses.append([-x, a, b])
+        self.clauses.append([-x, -a, -b])
+        self.clauses.append([x, -a, b])
+        self.clauses.append([x, a, -b])
+        return x
+
+
+class DPLLSolver:
+    """
+    DPLL satisfiability solver with two-watched-literal unit propagation and chronological
+    backtracking.
+
+    Args:
+        clauses: A list of clauses, each a list of non-zero ints (negative for negated literals).
+        num_vars: The number of variables; ids run from 1 to num_vars.
+    """
+    def __init__(self, clauses, num_vars):
+        self.num_vars = num_vars
+        self.values = [None] * (num_vars + 1)
+        self.trail = []
+        self.watches = {}
+        self.clauses = []
+        self.units = []
+        self.empty_clause = False
+        for clause in clauses:
+            clause = list(dict.fromkeys(clause))  # drop duplicate literals, keep order
+            if any(-lit in clause for lit in clause):
+                continue  # tautological clause
+            if not clause:
+                self.empty_clause = True
+            elif len(clause) == 1:
+                self.units.append(clause[0])
+            else:
+                index = len(self.clauses)
+                self.clauses.append(clause)
+                self.watches.setdefault(clause[0], []).append(index)
+                self.watches.setdefault(clause[1], []).append(index)
+
+    def value(self, lit):
+        value = self.values[abs(lit)]
+        if value is None:
+            return None
+        return value if lit > 0 else not value
+
+    def assign(self, lit):
+        self.values[abs(lit)] = lit > 0
+        self.trail.append(lit)
+
+    def propagate(self, head):
+        """
+        Propagates every assignment on the trail from position head onwards.
+
+        Returns:
+            bool: False if a conflict was found, True otherwise.
+        """
+        while head < len(self.trail):
+            false_lit = -self.trail[head]
+            head += 1
+            watching = self.watches.get(false_lit, [])
+            kept = []
+            conflict = False
+            for position, index in enumerate(watching):
+                if conflict:
+                    kept.append(index)
+                    continue
+                clause = self.clauses[index]
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self.value(clause[0]) is True:
+                    kept.append(index)
+                    continue
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches.setdefault(clause[1], []).append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if self.value(clause[0]) is False:
+                        conflict = True
+                    else:
+                        self.assign(clause[0])
+            self.watches[false_lit] = kept
+            if conflict:
+                return False
+        return True
+
+    def undo(self, length):
+        while len(self.trail) > length:
+            self.values[abs(self.trail.pop())] = None
+
+    def solve(self):
+        """
+        Searches for a satisfying assignment.
+
+        Returns:
+            list: values indexed by variable id when satisfiable, otherwise None.
+        """
+        if self.empty_clause:
+            return None
+        for lit in self.units:
+            current = self.value(lit)
+            if current is False:
+                return None
+            if current is None:
+                self.assign(lit)
+        if not self.propagate(0):
+            return None
+
+        decisions = []  # (trail length before decision, decision literal, already flipped)
+        next_var = 1
+        while True:
+            while next_var <= self.num_vars and self.values[next_var] is not None:
+                next_var += 1
+            if next_var > self.num_vars:
+                return [bool(v) for v in self.values]
+
+            decisions.append((len(self.trail), next_var, False))
+            self.assign(next_var)
+            head = len(self.trail) - 1
+            while not self.propagate(head):
+                while decisions and decisions[-1][2]:
+                    decisions.pop()
+                if not decisions:
+                    return None
+                length, lit, _ = decisions.pop()
+                self.undo(length)
+                decisions.append((length, -lit, True))
+                self.assign(-lit)
+                head = len(self.trail) - 1
+                next_var = 1
+
+
+def find_model(tree):
+    """
+    Finds an assignment that makes the formula true.
+
+    Args:
+        tree: The root of a parsed expression.
+
+    Returns:
+        dict: variable name -> bool for a satisfying assignment, or None if unsatisfiable.
+    """
+    encoder = CNFEncoder()
+    root = encoder.encode(tree)
+    encoder.clauses.append([root])
+    solution = DPLLSolver(encoder.clauses, encoder.num_vars).solve()
+    if solution is None:
+        return None
+    return {name: solution[var] for name, var in encoder.variable_ids.items()}
+
+
+def find_counterexample(tree):
+    """
+    Finds an assignment that makes the formula false.
+
+    Args:
+        tree: The root of a parsed expression.
+
+    Returns:
+        dict: variable name -> bool for a falsifying assignment, or None if the formula is valid.
+    """
+    return find_model(Not(tree))